@@ -0,0 +1,111 @@
+import argparse
+import time
+
+import faiss
+import numpy as np
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+
+import observation_index
+
+observations_free_text_file = "observations_free_text_TIME.xlsx"
+
+
+def synthetic_corpus(base_vectors, size, noise, rng):
+    """Scales the real observation embeddings up by adding Gaussian noise around them."""
+    picks = rng.integers(0, len(base_vectors), size=size)
+    vectors = base_vectors[picks] + rng.normal(0.0, noise, size=(size, base_vectors.shape[1]))
+    vectors = vectors.astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build_index(kind, vectors, nlist, hnsw_m):
+    dim = vectors.shape[1]
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+    index.add(vectors)
+    return index
+
+
+def recall_at_k(ground_truth, found):
+    hits = sum(len(set(gt) & set(f)) for gt, f in zip(ground_truth, found))
+    return hits / ground_truth.size
+
+
+def fit_calibration_pairs(model, pairs_file):
+    """Fits the cosine -> relevance calibration on labelled pairs (columns Text_A, Text_B, Relevant)."""
+    pairs = pd.read_csv(pairs_file) if pairs_file.endswith(".csv") else pd.read_excel(pairs_file)
+    a = observation_index.encode(model, pairs["Text_A"].astype(str).tolist())
+    b = observation_index.encode(model, pairs["Text_B"].astype(str).tolist())
+    cosines = (a * b).sum(axis=1)
+    midpoint, temperature = observation_index.fit_calibration(cosines, pairs["Relevant"].astype(int))
+    observation_index.save_calibration(midpoint, temperature)
+    print(f"🎯 Calibration fitted on {len(pairs)} pairs: midpoint={midpoint:.3f}, temperature={temperature:.3f} "
+          f"(saved to {observation_index.calibration_file})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/recall benchmark for the TIME RAG index types")
+    parser.add_argument('--size', type=int, default=200_000, help='Number of synthetic observation vectors')
+    parser.add_argument('--queries', type=int, default=1_000, help='Number of queries')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--noise', type=float, default=0.05, help='Std-dev of the synthetic noise')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 8, 32], help='IVF nprobe values to sweep')
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 64, 128], help='HNSW efSearch values')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--calibration-pairs', type=str, default=None,
+                        help='Labelled pairs (Text_A, Text_B, Relevant 0/1) to fit the score calibration on, then exit')
+    args = parser.parse_args()
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    if args.calibration_pairs:
+        fit_calibration_pairs(model, args.calibration_pairs)
+        return
+
+    rng = np.random.default_rng(args.seed)
+    df = pd.read_excel(observations_free_text_file)
+    base_vectors = observation_index.encode(model, df["Observation_Text"].astype(str).tolist())
+
+    corpus = synthetic_corpus(base_vectors, args.size, args.noise, rng)
+    queries = synthetic_corpus(base_vectors, args.queries, args.noise, rng)
+    nlist = int(4 * np.sqrt(args.size))
+
+    results = []
+    start = time.perf_counter()
+    flat = build_index("flat", corpus, nlist, 32)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, ground_truth = flat.search(queries, args.k)
+    flat_latency = (time.perf_counter() - start) / args.queries
+    results.append(("flat", "exact", build_seconds, flat_latency, 1.0))
+
+    for kind, param_name, values in (("ivf", "nprobe", args.nprobe), ("hnsw", "efSearch", args.ef_search)):
+        start = time.perf_counter()
+        index = build_index(kind, corpus, nlist, 32)
+        build_seconds = time.perf_counter() - start
+        for value in values:
+            if kind == "ivf":
+                index.nprobe = value
+            else:
+                index.hnsw.efSearch = value
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k)
+            latency = (time.perf_counter() - start) / args.queries
+            results.append((kind, f"{param_name}={value}", build_seconds, latency, recall_at_k(ground_truth, found)))
+
+    print(f"\n📊 {args.size:,} vectors, {args.queries:,} queries, k={args.k}")
+    print(f"{'index':<6} {'params':<14} {'build s':>8} {'ms/query':>9} {'recall@k':>9}")
+    for kind, params, build_seconds, latency, recall in results:
+        print(f"{kind:<6} {params:<14} {build_seconds:>8.2f} {latency * 1000:>9.3f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import sqlite3
+
+
+def _create_chat_memory(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS chat_memory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_query TEXT,
+        ai_response TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _add_column(name, definition):
+    """Builds a migration step that adds a column unless an older script already did."""
+
+    def step(cursor):
+        # Legacy databases (user_version 0) may already carry some of these columns,
+        # so this is the only place the table is introspected - and only once.
+        cursor.execute("PRAGMA table_info(chat_memory)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE chat_memory ADD COLUMN {name} {definition}")
+
+    return step
+
+
+def _create_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_memory_session_ts ON chat_memory (session_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_memory_ts ON chat_memory (timestamp)")
+
+
+def _create_embeddings(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS chat_memory_embedding (
+        memory_id INTEGER PRIMARY KEY REFERENCES chat_memory (id) ON DELETE CASCADE,
+        embedding BLOB NOT NULL
+    )
+    """)
+
+
+def _create_compaction_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS chat_memory_summary (
+        session_id TEXT PRIMARY KEY,
+        summary TEXT,
+        turns_summarized INTEGER DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS chat_memory_archive (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT,
+        role TEXT,
+        feedback INTEGER,
+        timestamp DATETIME,
+        payload BLOB
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_memory_archive_session ON chat_memory_archive (session_id)")
+
+
+# Ordered schema history: the database's PRAGMA user_version is the number of applied steps.
+MIGRATIONS = [
+    _create_chat_memory,
+    _add_column("role", "TEXT"),
+    _add_column("feedback", "INTEGER DEFAULT 0"),
+    _add_column("session_id", "TEXT"),
+    _create_indexes,
+    _create_embeddings,
+    _create_compaction_tables,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """Brings the chat_memory database up to the latest schema. Returns the resulting version."""
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+        print(f"🗄️ chat_memory schema migrated to v{target}")
+
+    return SCHEMA_VERSION
+
+
+def connect(db_file, **kwargs):
+    """Opens the chat memory database and applies any pending migrations."""
+    conn = sqlite3.connect(db_file, **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    migrate(conn)
+    return conn
@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import faiss
+import numpy as np
+
+import observation_index
+from metadata_store import MetadataStore
+
+policy_documents_dir = "policy_documents"
+policy_index_file = "policy_documents.index"
+policy_metadata_file = "policy_documents.db"
+document_extensions = (".md", ".txt", ".pdf")
+
+embedding_model_name = "all-MiniLM-L6-v2"
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts):
+    return observation_index.encode(_worker_model, texts)
+
+
+def read_document(path):
+    """Returns the text of a Markdown/text file, or of a PDF when pypdf is installed."""
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            print(f"⚠️ Skipping {path}: install pypdf or provide PDF-extracted text as .txt")
+            return ""
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def chunk_text(text, chunk_size=800, overlap=150):
+    """Splits text into overlapping windows of about chunk_size characters, cut at whitespace."""
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + chunk_size // 2, end)
+            end = cut if cut != -1 else end
+        chunks.append(text[start:end].strip())
+        if end == len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Start the next chunk on a word boundary
+        if text[start - 1] != " ":
+            space = text.find(" ", start, end)
+            start = space + 1 if space != -1 else start
+    return [chunk for chunk in chunks if chunk]
+
+
+def chunk_id(path, chunk_number):
+    """Stable positive 60-bit FAISS id per (file, chunk position)."""
+    return int(hashlib.sha1(f"{path}:{chunk_number}".encode("utf-8")).hexdigest()[:15], 16)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ingestion_digest(content_hash, chunk_size, overlap, model_name):
+    """Manifest key of a file: its content plus everything that shapes its chunks and embeddings."""
+    return hashlib.sha1(f"{content_hash}:{chunk_size}:{overlap}:{model_name}".encode("utf-8")).hexdigest()
+
+
+class IngestionManifest:
+    """Records which files are fully ingested (ingestion digest and chunk count) so runs can resume."""
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file)
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                path TEXT PRIMARY KEY,
+                file_hash TEXT,
+                chunk_count INTEGER
+            )
+            """)
+
+    def entries(self):
+        return {path: (digest, count) for path, digest, count in
+                self.conn.execute("SELECT path, file_hash, chunk_count FROM ingested_files")}
+
+    def mark_done(self, path, digest, chunk_count):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO ingested_files (path, file_hash, chunk_count) VALUES (?, ?, ?)",
+                              (path, digest, chunk_count))
+
+    def forget(self, path):
+        with self.conn:
+            self.conn.execute("DELETE FROM ingested_files WHERE path = ?", (path,))
+
+
+def load_index(index_file, embedding_dim):
+    if os.path.exists(index_file):
+        return faiss.read_index(index_file)
+    return observation_index.new_index(embedding_dim)
+
+
+def discover(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(document_extensions):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def _remove_chunks(index, store, path, chunk_count):
+    ids = [chunk_id(path, n) for n in range(chunk_count)]
+    if ids:
+        index.remove_ids(np.array(ids, dtype=np.int64))
+        store.delete_many(ids)
+
+
+def ingest_directory(directory=policy_documents_dir, index_file=policy_index_file, metadata_file=policy_metadata_file,
+                     embedding_dim=384, workers=None, batch_size=64, chunk_size=800, overlap=150,
+                     model_name=embedding_model_name):
+    """Chunks, embeds and indexes new or changed documents; unchanged files are skipped.
+
+    A file counts as unchanged only if its content, chunk_size, overlap and model_name all match
+    the last run, so changing the chunking or the model re-ingests every file.
+
+    Embedding runs in a spawned process pool of at most one worker per batch; a single
+    batch is embedded in-process. Call this from a standalone entry point (main() below),
+    never from a script with module-level work: spawned workers re-import __main__.
+    The index is saved and the file marked done after each file, so an interrupted run
+    resumes where it stopped. Returns (index, store).
+    """
+    store = MetadataStore(metadata_file)
+    manifest = IngestionManifest(metadata_file)
+    index = load_index(index_file, embedding_dim)
+    done = manifest.entries()
+
+    paths = discover(directory) if os.path.isdir(directory) else []
+    # Documents deleted from the directory leave the index too
+    deleted = set(done) - set(paths)
+    for path in deleted:
+        _remove_chunks(index, store, path, done[path][1])
+        manifest.forget(path)
+    if deleted:
+        observation_index.save(index, index_file)
+
+    pending = []
+    for path in paths:
+        content_hash = file_hash(path)
+        if done.get(path, (None,))[0] != ingestion_digest(content_hash, chunk_size, overlap, model_name):
+            pending.append((path, content_hash))
+
+    documents = [(path, content_hash, chunk_text(read_document(path), chunk_size, overlap))
+                 for path, content_hash in pending]
+    total_batches = sum(-(-len(chunks) // batch_size) for _, _, chunks in documents)
+    workers = min(workers or os.cpu_count() or 1, total_batches)
+
+    if documents:
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                       initializer=_init_worker, initargs=(model_name,))
+            encode_batches = pool.map
+        else:
+            pool = None
+            if total_batches:
+                _init_worker(model_name)
+            encode_batches = map
+        try:
+            for path, content_hash, chunks in documents:
+                previous_count = done.get(path, (None, 0))[1]
+                # Also clears chunks left by an interrupted earlier attempt at this file
+                _remove_chunks(index, store, path, max(previous_count, len(chunks)))
+
+                batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+                position = 0
+                for embeddings in encode_batches(_encode_batch, batches):
+                    ids = [chunk_id(path, position + n) for n in range(len(embeddings))]
+                    index.add_with_ids(embeddings, np.array(ids, dtype=np.int64))
+                    store.upsert_many([{
+                        "id": doc_id,
+                        "text": chunks[position + n],
+                        "hash": content_hash,
+                        "source": os.path.relpath(path, directory),
+                        "chunk": position + n,
+                    } for n, doc_id in enumerate(ids)])
+                    position += len(embeddings)
+
+                observation_index.save(index, index_file)
+                manifest.mark_done(path, ingestion_digest(content_hash, chunk_size, overlap, model_name), len(chunks))
+                print(f"📄 Ingested {path}: {len(chunks)} chunks")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    print(f"✅ Policy document index ready with {index.ntotal} chunks from {len(paths)} files")
+    return index, store
+
+
+def retrieve_documents(index, store, query_vector, k=2, min_score=0.5):
+    """Returns [(record, calibrated_score)] for the best matching document chunks."""
+    return [(record, score) for record, _, score in
+            observation_index.search(index, store, query_vector, k=k, min_score=min_score)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest policy documents into the TIME RAG index")
+    parser.add_argument('--docs', type=str, default=policy_documents_dir, help='Directory of .md/.txt/.pdf files')
+    parser.add_argument('--workers', type=int, default=None, help='Embedding processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=64, help='Chunks per embedding batch')
+    parser.add_argument('--chunk-size', type=int, default=800, help='Characters per chunk')
+    parser.add_argument('--overlap', type=int, default=150, help='Characters shared by neighbouring chunks')
+    parser.add_argument('--model', type=str, default=embedding_model_name, help='Sentence-transformers model')
+    args = parser.parse_args()
+
+    ingest_directory(args.docs, workers=args.workers, batch_size=args.batch_size, chunk_size=args.chunk_size,
+                     overlap=args.overlap, model_name=args.model)
+
+
+if __name__ == "__main__":
+    main()
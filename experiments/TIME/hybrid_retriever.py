@@ -0,0 +1,133 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import observation_index
+
+# Keeps system names and error codes such as "ERP", "ISO-27001" or "0x80070005" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or over the this to was were what
+when which with why our we you i my me do does did can should there their any all no not
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory BM25 inverted index that supports incremental add/remove by document id."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.doc_terms = {}  # doc_id -> Counter, needed to remove a document again
+        self.doc_lengths = {}
+        self.doc_hashes = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, doc_id, text, doc_hash=None):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.doc_hashes[doc_id] = doc_hash
+        self.total_length += self.doc_lengths[doc_id]
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+        self.doc_hashes.pop(doc_id, None)
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def sync(self, records):
+        """Applies {doc_id: record} (with "text" and "hash") incrementally. Returns the number of changes."""
+        changes = 0
+        for doc_id in [i for i in self.doc_terms if i not in records]:
+            self.remove(doc_id)
+            changes += 1
+        for doc_id, record in records.items():
+            if self.doc_hashes.get(doc_id) != record["hash"] or doc_id not in self.doc_terms:
+                self.add(doc_id, record["text"], record["hash"])
+                changes += 1
+        return changes
+
+    def search(self, query, k=10):
+        """Returns [(doc_id, bm25_score)] for documents sharing at least one term with the query."""
+        n_docs = len(self.doc_terms)
+        if n_docs == 0:
+            return []
+        avg_length = self.total_length / n_docs
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Fuses several ranked id lists: score(d) = sum over lists of 1 / (rrf_k + rank)."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """BM25 over observation text fused with the FAISS vector index via reciprocal rank fusion."""
+
+    def __init__(self, index, store, embedding_model, fetch_k=20, min_vector_score=0.5):
+        self.index = index
+        self.store = store
+        self.embedding_model = embedding_model
+        self.fetch_k = fetch_k
+        self.min_vector_score = min_vector_score
+        self.bm25 = BM25Index()
+
+    def sync(self, df):
+        """Updates the vector index and the BM25 index from the observations frame, incrementally."""
+        vector_changes = observation_index.sync(self.index, self.store, df, self.embedding_model)
+        lexical_changes = self.bm25.sync(dict(observation_index.observation_records(df)))
+        return vector_changes, lexical_changes
+
+    def search(self, query, k=3):
+        """Returns [(record, fused_score, vector_score)] best first.
+
+        A hit is kept when it matches the query lexically or its calibrated vector
+        score clears min_vector_score.
+        """
+        lexical = self.bm25.search(query, self.fetch_k)
+        query_vector = observation_index.encode(self.embedding_model, [query])
+        vector = observation_index.search(self.index, self.store, query_vector, k=self.fetch_k, min_score=0.0)
+
+        vector_scores = {record["id"]: score for record, _, score in vector}
+        lexical_ids = {doc_id for doc_id, _ in lexical}
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in lexical], [r["id"] for r, _, _ in vector]])
+        fused = [(doc_id, score) for doc_id, score in fused
+                 if doc_id in lexical_ids or vector_scores.get(doc_id, 0.0) >= self.min_vector_score][:k]
+
+        records = self.store.get_many([doc_id for doc_id, _ in fused])
+        return [(records[doc_id], score, vector_scores.get(doc_id, 0.0))
+                for doc_id, score in fused if doc_id in records]
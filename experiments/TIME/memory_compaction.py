@@ -0,0 +1,135 @@
+import json
+import threading
+import zlib
+
+import ollama
+
+import chat_memory_schema
+
+# Per-session budget: sessions above max_turns are compacted down to keep_recent raw turns
+max_turns_per_session = 200
+keep_recent_turns = 50
+summary_batch_size = 20
+
+
+def summarize_turns(previous_summary, turns, model="llama3.2"):
+    """Folds a batch of (user_query, ai_response, role) turns into the rolling session summary."""
+    transcript = "\n\n".join(f"[{role or 'AI'}] Q: {query}\nA: {response}" for query, response, role in turns)
+    prompt = f"""
+    Update the running summary of an IT systems support conversation.
+
+    Current summary:
+    {previous_summary or "(empty)"}
+
+    New conversation turns:
+    {transcript}
+
+    Return only the updated summary. Keep system names, issues, decisions and open action items; drop small talk.
+    """
+    response = ollama.chat(
+        model=model,
+        messages=[{"role": "system", "content": "You maintain concise conversation summaries for IT analysts."},
+                  {"role": "user", "content": prompt}]
+    )
+    return response["message"].get("content", previous_summary or "")
+
+
+def compress_turn(user_query, ai_response):
+    return zlib.compress(json.dumps({"user_query": user_query, "ai_response": ai_response}).encode("utf-8"))
+
+
+def decompress_turn(payload):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def retrieve_summary(conn, session_id):
+    """Returns the rolling summary of the session's compacted turns (or an empty string)."""
+    row = conn.execute("SELECT summary FROM chat_memory_summary WHERE session_id = ?", (session_id,)).fetchone()
+    return row[0] if row and row[0] else ""
+
+
+def retrieve_archived(conn, session_id, limit=50):
+    """Returns archived raw turns of a session, newest first."""
+    rows = conn.execute(
+        "SELECT id, role, feedback, timestamp, payload FROM chat_memory_archive WHERE session_id = ? "
+        "ORDER BY timestamp DESC, id DESC LIMIT ?", (session_id, limit)).fetchall()
+    return [{"id": row[0], "role": row[1], "feedback": row[2], "timestamp": row[3], **decompress_turn(row[4])}
+            for row in rows]
+
+
+def compact_session(conn, session_id, keep_recent=keep_recent_turns, batch_size=summary_batch_size,
+                    model="llama3.2", semantic_memory=None):
+    """Summarizes and archives all but the most recent turns of one session. Returns the number archived.
+
+    The archived turns (and, by cascade, their embeddings) leave chat_memory, so they are also removed
+    from the semantic_memory index cache when one is given; otherwise retrieval fills up with dead ids.
+    """
+    rows = conn.execute(
+        "SELECT id, user_query, ai_response, role, feedback, timestamp FROM chat_memory WHERE session_id = ? "
+        "ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?", (session_id, keep_recent)).fetchall()
+    rows.reverse()  # oldest first, so the summary reads chronologically
+
+    archived = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        summary = summarize_turns(retrieve_summary(conn, session_id), [(r[1], r[2], r[3]) for r in batch], model)
+
+        # Summary, archive and delete land together so a crash never loses or duplicates turns
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chat_memory_archive (id, session_id, role, feedback, timestamp, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(r[0], session_id, r[3], r[4], r[5], compress_turn(r[1], r[2])) for r in batch])
+            conn.executemany("DELETE FROM chat_memory WHERE id = ?", [(r[0],) for r in batch])
+            conn.execute(
+                "INSERT INTO chat_memory_summary (session_id, summary, turns_summarized, updated_at) "
+                "VALUES (?, ?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                "turns_summarized = turns_summarized + excluded.turns_summarized, updated_at = CURRENT_TIMESTAMP",
+                (session_id, summary, len(batch)))
+        if semantic_memory is not None:
+            semantic_memory.forget(session_id, [r[0] for r in batch])
+        archived += len(batch)
+
+    return archived
+
+
+def compact_all(conn, max_turns=max_turns_per_session, keep_recent=keep_recent_turns,
+                batch_size=summary_batch_size, model="llama3.2", semantic_memory=None):
+    """Compacts every session that exceeds its size budget. Returns {session_id: turns_archived}."""
+    sessions = conn.execute(
+        "SELECT session_id FROM chat_memory GROUP BY session_id HAVING COUNT(*) > ?", (max_turns,)).fetchall()
+    return {session_id: compact_session(conn, session_id, keep_recent, batch_size, model, semantic_memory)
+            for (session_id,) in sessions}
+
+
+def start_background_compaction(db_file, interval_seconds=600, **kwargs):
+    """Runs compact_all periodically on a daemon thread with its own connection. Returns a stop event.
+
+    Pass the chat loop's SemanticMemory as semantic_memory= so its cached indexes drop compacted turns.
+    """
+    stop_event = threading.Event()
+
+    def worker():
+        conn = chat_memory_schema.connect(db_file)
+        try:
+            while True:
+                try:
+                    compacted = compact_all(conn, **kwargs)
+                    if compacted:
+                        print(f"🧹 Compacted chat memory: {compacted}")
+                except Exception as e:
+                    print(f"⚠️ Memory compaction failed: {e}")
+                if stop_event.wait(interval_seconds):
+                    break
+        finally:
+            conn.close()
+
+    threading.Thread(target=worker, name="chat-memory-compaction", daemon=True).start()
+    return stop_event
+
+
+if __name__ == "__main__":
+    connection = chat_memory_schema.connect("chat_memory.db")
+    print(f"🧹 Compacted chat memory: {compact_all(connection)}")
+    connection.close()
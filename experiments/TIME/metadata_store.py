@@ -0,0 +1,76 @@
+import json
+import sqlite3
+import threading
+
+
+class MetadataStore:
+    """SQLite-backed metadata for a FAISS index, keyed by FAISS id.
+
+    Records are plain dicts with at least "id", "text" and "hash"; any other fields
+    are kept in a JSON payload column. Nothing is loaded up front: search hits are
+    resolved with point lookups, and writes are batched in one transaction.
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                hash TEXT,
+                text TEXT,
+                payload TEXT
+            )
+            """)
+
+    @staticmethod
+    def _to_row(record):
+        payload = {k: v for k, v in record.items() if k not in ("id", "hash", "text")}
+        return int(record["id"]), record.get("hash"), record["text"], json.dumps(payload, default=str)
+
+    @staticmethod
+    def _to_record(row):
+        return {"id": row[0], "hash": row[1], "text": row[2], **json.loads(row[3] or "{}")}
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get(self, doc_id):
+        with self.lock:
+            row = self.conn.execute("SELECT id, hash, text, payload FROM documents WHERE id = ?",
+                                    (int(doc_id),)).fetchone()
+        return self._to_record(row) if row else None
+
+    def get_many(self, doc_ids):
+        """Returns {id: record} for the given ids; unknown ids are left out."""
+        ids = [int(i) for i in doc_ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(f"SELECT id, hash, text, payload FROM documents WHERE id IN ({placeholders})",
+                                     ids).fetchall()
+        return {row[0]: self._to_record(row) for row in rows}
+
+    def hashes(self):
+        """Returns {id: content hash} without loading texts or payloads."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT id, hash FROM documents").fetchall())
+
+    def upsert_many(self, records):
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO documents (id, hash, text, payload) VALUES (?, ?, ?, ?)",
+                                  [self._to_row(r) for r in records])
+
+    def delete_many(self, doc_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM documents WHERE id = ?", [(int(i),) for i in doc_ids])
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM documents")
+
+    def close(self):
+        self.conn.close()
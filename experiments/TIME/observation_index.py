@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+
+import faiss
+import numpy as np
+
+# Logistic calibration of cosine similarity to a 0-1 relevance score. The defaults are placeholders
+# (a rough guess for all-MiniLM-L6-v2), not fitted values: run
+# `benchmark_rag_index.py --calibration-pairs <labelled pairs>` to fit them into calibration_file.
+calibration_file = os.getenv("RAG_CALIBRATION_FILE", "rag_calibration.json")
+calibration_midpoint = 0.35
+calibration_temperature = 0.08
+if os.path.exists(calibration_file):
+    with open(calibration_file, encoding="utf-8") as f:
+        _fitted = json.load(f)
+    calibration_midpoint = _fitted["midpoint"]
+    calibration_temperature = _fitted["temperature"]
+
+
+def observation_records(df):
+    """Yields (faiss_id, record) for every observation row, keyed by Observation_ID when present."""
+    for idx, row in df.iterrows():
+        observation_id = row.get("Observation_ID", idx)
+        record = {
+            "id": int(observation_id),
+            "text": row["Observation_Text"],
+            "category": row.get("Category", "General"),
+            "suggestion": row.get("Suggested_Action", "No suggestion available."),
+        }
+        record["hash"] = content_hash(record)
+        yield record["id"], record
+
+
+def content_hash(record):
+    payload = json.dumps([record["text"], record["category"], record["suggestion"]], default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def new_index(embedding_dim):
+    """Inner product over L2-normalized vectors, i.e. exact cosine similarity. IDMap2 keeps vectors
+    reconstructable by id, which MMR re-ranking needs."""
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(embedding_dim))
+
+
+def encode(embedding_model, texts, batch_size=64):
+    embeddings = embedding_model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=True)
+    return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
+
+def store_fingerprint(store):
+    """Digest of the store's (id, content hash) pairs, i.e. of exactly which vectors the index must hold."""
+    digest = hashlib.sha1()
+    for doc_id, content in sorted(store.hashes().items()):
+        digest.update(f"{doc_id}:{content};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _fingerprint_file(index_file):
+    return index_file + ".json"
+
+
+def load(index_file, store, embedding_dim):
+    """Loads the saved index, or returns an empty one (clearing the store) if it is missing or out of step.
+
+    The index is only accepted when it was saved together with the store's current ids and content
+    hashes, so an update interrupted between the store commit and the index save forces a rebuild.
+    """
+    if os.path.exists(index_file) and os.path.exists(_fingerprint_file(index_file)):
+        index = faiss.read_index(index_file)
+        with open(_fingerprint_file(index_file), encoding="utf-8") as f:
+            saved = json.load(f)
+        # Older L2 / positional-id indexes are not comparable; start over
+        if (isinstance(index, faiss.IndexIDMap2) and index.metric_type == faiss.METRIC_INNER_PRODUCT
+                and index.d == embedding_dim and index.ntotal == saved.get("ntotal")
+                and saved.get("store") == store_fingerprint(store)):
+            return index
+    store.clear()
+    return new_index(embedding_dim)
+
+
+def sync(index, store, df, embedding_model, batch_size=64):
+    """Brings the index and its metadata store in line with the observations frame.
+
+    Only new or changed rows are encoded (in batches); rows that disappeared are
+    removed. Returns (added, updated, removed) counts.
+    """
+    current = dict(observation_records(df))
+    stored_hashes = store.hashes()
+
+    removed_ids = [i for i in stored_hashes if i not in current]
+    changed_ids = [i for i, record in current.items() if i in stored_hashes and stored_hashes[i] != record["hash"]]
+    added_ids = [i for i in current if i not in stored_hashes]
+
+    stale = removed_ids + changed_ids
+    if stale:
+        index.remove_ids(np.array(stale, dtype=np.int64))
+        store.delete_many(removed_ids)
+
+    to_encode = changed_ids + added_ids
+    for start in range(0, len(to_encode), batch_size):
+        batch_ids = to_encode[start:start + batch_size]
+        embeddings = encode(embedding_model, [current[i]["text"] for i in batch_ids], batch_size)
+        index.add_with_ids(embeddings, np.array(batch_ids, dtype=np.int64))
+        store.upsert_many([current[i] for i in batch_ids])
+
+    return len(added_ids), len(changed_ids), len(removed_ids)
+
+
+def save(index, index_file, store=None):
+    """Writes the index to a temporary file and swaps it in, so readers never see a partial file.
+
+    With a store, the fingerprint of its ids and content hashes is written next to the index
+    (after it), which is what load() checks; the store commits per batch during sync(), so a
+    crash before this point leaves a stale fingerprint and the index is rebuilt.
+    """
+    faiss.write_index(index, index_file + ".tmp")
+    os.replace(index_file + ".tmp", index_file)
+    if store is not None:
+        with open(_fingerprint_file(index_file) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ntotal": int(index.ntotal), "store": store_fingerprint(store)}, f)
+        os.replace(_fingerprint_file(index_file) + ".tmp", _fingerprint_file(index_file))
+
+
+def calibrate(cosine, midpoint=None, temperature=None):
+    """Maps raw cosine similarity to a 0-1 relevance score."""
+    midpoint = calibration_midpoint if midpoint is None else midpoint
+    temperature = calibration_temperature if temperature is None else temperature
+    return 1.0 / (1.0 + np.exp(-(np.asarray(cosine, dtype=np.float64) - midpoint) / temperature))
+
+
+def fit_calibration(cosines, labels, iterations=50, l2=1e-3):
+    """Fits (midpoint, temperature) of calibrate() to labelled pairs (1 relevant, 0 not) by logistic regression.
+
+    Newton iterations on p = sigmoid(w * cosine + b); midpoint = -b / w, temperature = 1 / w.
+    """
+    x = np.column_stack([np.asarray(cosines, dtype=np.float64), np.ones(len(cosines))])
+    y = np.asarray(labels, dtype=np.float64)
+    if len(set(y.tolist())) < 2:
+        raise ValueError("Calibration needs both relevant and irrelevant pairs")
+    weights = np.zeros(2)
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(x @ weights)))
+        gradient = x.T @ (p - y) + l2 * weights
+        hessian = (x * (p * (1 - p))[:, None]).T @ x + l2 * np.eye(2)
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    slope, intercept = weights
+    if slope <= 0:
+        raise ValueError("Relevant pairs do not score higher than irrelevant ones; cannot calibrate")
+    return float(-intercept / slope), float(1.0 / slope)
+
+
+def save_calibration(midpoint, temperature, path=None):
+    with open(path or calibration_file, "w", encoding="utf-8") as f:
+        json.dump({"midpoint": midpoint, "temperature": temperature}, f, indent=2)
+
+
+def mmr(query_vector, candidate_vectors, k, lambda_mult=0.7):
+    """Maximal marginal relevance: returns positions of k candidates balancing relevance and diversity."""
+    relevance = candidate_vectors @ query_vector
+    pairwise = candidate_vectors @ candidate_vectors.T
+    selected = [int(np.argmax(relevance))]
+    remaining = set(range(len(candidate_vectors))) - set(selected)
+    while remaining and len(selected) < k:
+        candidates = np.array(sorted(remaining))
+        redundancy = pairwise[np.ix_(candidates, selected)].max(axis=1)
+        scores = lambda_mult * relevance[candidates] - (1.0 - lambda_mult) * redundancy
+        best = int(candidates[np.argmax(scores)])
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def search(index, store, query_vector, k=3, use_mmr=False, fetch_k=20, lambda_mult=0.7, min_score=0.5):
+    """Top-k search returning [(record, cosine, calibrated_score)], best first.
+
+    With use_mmr, fetch_k nearest neighbours are re-ranked for diversity before
+    cutting to k. Hits whose calibrated score is below min_score are dropped.
+    """
+    if index.ntotal == 0:
+        return []
+
+    query_vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    n_candidates = min(max(k, fetch_k) if use_mmr else k, index.ntotal)
+    cosines, ids = index.search(query_vector, n_candidates)
+    hits = [(int(i), float(c)) for i, c in zip(ids[0], cosines[0]) if i != -1]
+
+    if use_mmr and len(hits) > k:
+        vectors = np.vstack([index.reconstruct(i) for i, _ in hits])
+        hits = [hits[p] for p in mmr(query_vector[0], vectors, k, lambda_mult)]
+    hits = hits[:k]
+
+    records = store.get_many([i for i, _ in hits])
+    results = []
+    for doc_id, cosine in hits:
+        score = float(calibrate(cosine))
+        if doc_id in records and score >= min_score:
+            results.append((records[doc_id], cosine, score))
+    return results
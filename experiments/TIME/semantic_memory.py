@@ -0,0 +1,160 @@
+import threading
+import time
+
+import faiss
+import numpy as np
+
+
+class SemanticMemory:
+    """Embedding-indexed long-term memory over the chat_memory table.
+
+    One FAISS inner-product index per session is loaded lazily from the
+    chat_memory_embedding table and then kept up to date by add() and forget(), so a new
+    or compacted turn never triggers a rebuild.
+    """
+
+    def __init__(self, conn, embedding_model, feedback_weight=0.25, recency_half_life_hours=72.0,
+                 candidate_pool=20):
+        self.conn = conn
+        self.embedding_model = embedding_model
+        self.feedback_weight = feedback_weight
+        self.recency_half_life_hours = recency_half_life_hours
+        self.candidate_pool = candidate_pool
+        self.embedding_dim = embedding_model.get_sentence_embedding_dimension()
+        self._indexes = {}
+        # Background compaction removes ids while the chat loop searches
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def turn_text(user_query, ai_response):
+        return f"{user_query}\n{ai_response}"
+
+    @staticmethod
+    def estimate_tokens(text):
+        """Cheap token estimate (~4 characters per token) used for prompt budgeting."""
+        return len(text) // 4 + 1
+
+    def _encode(self, texts):
+        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.embedding_dim)
+
+    def _session_index(self, session_id):
+        """Returns the session's index, loading stored embeddings and backfilling missing ones once."""
+        with self._lock:
+            return self._load_session_index(session_id)
+
+    def _load_session_index(self, session_id):
+        index = self._indexes.get(session_id)
+        if index is not None:
+            return index
+
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(self.embedding_dim))
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT m.id, e.embedding FROM chat_memory m JOIN chat_memory_embedding e ON e.memory_id = m.id "
+            "WHERE m.session_id = ?", (session_id,))
+        rows = cursor.fetchall()
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            index.add_with_ids(vectors, ids)
+
+        # Turns saved before the embedding table existed are embedded in one batch.
+        cursor.execute(
+            "SELECT m.id, m.user_query, m.ai_response FROM chat_memory m "
+            "LEFT JOIN chat_memory_embedding e ON e.memory_id = m.id "
+            "WHERE m.session_id = ? AND e.memory_id IS NULL", (session_id,))
+        missing = cursor.fetchall()
+        if missing:
+            ids = np.array([row[0] for row in missing], dtype=np.int64)
+            vectors = self._encode([self.turn_text(row[1], row[2]) for row in missing])
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO chat_memory_embedding (memory_id, embedding) VALUES (?, ?)",
+                                      [(int(i), v.tobytes()) for i, v in zip(ids, vectors)])
+            index.add_with_ids(vectors, ids)
+
+        self._indexes[session_id] = index
+        return index
+
+    def add(self, memory_id, session_id, user_query, ai_response):
+        """Stores the embedding of one saved turn and adds it to the session index incrementally."""
+        vector = self._encode([self.turn_text(user_query, ai_response)])
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO chat_memory_embedding (memory_id, embedding) VALUES (?, ?)",
+                              (memory_id, vector[0].tobytes()))
+        with self._lock:
+            index = self._indexes.get(session_id)
+            if index is not None:
+                index.add_with_ids(vector, np.array([memory_id], dtype=np.int64))
+
+    def forget(self, session_id, memory_ids=None):
+        """Removes turns from the cached session index (call after they are deleted from chat_memory).
+
+        Without memory_ids the whole cached index is dropped, as after clear_memory.
+        """
+        with self._lock:
+            if memory_ids is None:
+                self._indexes.pop(session_id, None)
+                return
+            index = self._indexes.get(session_id)
+            if index is not None and len(memory_ids):
+                index.remove_ids(np.asarray(memory_ids, dtype=np.int64))
+
+    def retrieve(self, session_id, query, token_budget=512):
+        """Returns the most relevant past turns for the query that fit into the token budget.
+
+        Each candidate is scored by cosine similarity, scaled up by positive feedback
+        (down by negative) and decayed by age with the configured half-life.
+        """
+        index = self._session_index(session_id)
+        if index.ntotal == 0:
+            return []
+
+        query_vector = self._encode([query])
+        with self._lock:
+            if index.ntotal == 0:
+                return []
+            similarities, ids = index.search(query_vector, min(self.candidate_pool, index.ntotal))
+        hits = {int(i): float(s) for i, s in zip(ids[0], similarities[0]) if i != -1}
+        if not hits:
+            return []
+
+        placeholders = ",".join("?" * len(hits))
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"SELECT id, user_query, ai_response, role, COALESCE(feedback, 0), CAST(strftime('%s', timestamp) AS INTEGER) "
+            f"FROM chat_memory WHERE id IN ({placeholders})", list(hits))
+
+        now = time.time()
+        candidates = []
+        for memory_id, user_query, ai_response, role, feedback, created in cursor.fetchall():
+            age_hours = max(0.0, (now - (created or now)) / 3600.0)
+            recency = 0.5 ** (age_hours / self.recency_half_life_hours)
+            weight = max(0.0, 1.0 + self.feedback_weight * feedback)
+            candidates.append({
+                "id": memory_id,
+                "user_query": user_query,
+                "ai_response": ai_response,
+                "role": role,
+                "feedback": feedback,
+                "similarity": hits[memory_id],
+                "score": hits[memory_id] * weight * recency,
+            })
+
+        candidates.sort(key=lambda turn: turn["score"], reverse=True)
+
+        selected, used = [], 0
+        for turn in candidates:
+            cost = self.estimate_tokens(self.turn_text(turn["user_query"], turn["ai_response"]))
+            if used + cost > token_budget:
+                continue
+            selected.append(turn)
+            used += cost
+        return selected
+
+    def format_context(self, turns):
+        """Renders retrieved turns as a prompt section."""
+        if not turns:
+            return "No relevant past conversations."
+        return "\n\n".join(f"[{turn['role'] or 'AI'}] Q: {turn['user_query']}\nA: {turn['ai_response']}"
+                           for turn in turns)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("ollama")
+
+import chat_memory_schema
+import memory_compaction
+from semantic_memory import SemanticMemory
+
+TOPICS = ["printer", "vpn", "email", "backup"]
+
+
+class KeywordEmbedding:
+    """Deterministic stand-in for the sentence transformer: one dimension per topic word."""
+
+    def get_sentence_embedding_dimension(self):
+        return len(TOPICS) + 1
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        vectors = np.array([[float(topic in text) for topic in TOPICS] + [0.1] for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def save_turn(conn, memory, session_id, user_query, ai_response):
+    cursor = conn.execute("INSERT INTO chat_memory (session_id, user_query, ai_response, role) VALUES (?, ?, ?, ?)",
+                          (session_id, user_query, ai_response, "IT Analyst"))
+    conn.commit()
+    memory.add(cursor.lastrowid, session_id, user_query, ai_response)
+    return cursor.lastrowid
+
+
+def test_retrieval_returns_live_turns_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_compaction, "summarize_turns",
+                        lambda previous, turns, model="llama3.2": f"{previous} {len(turns)} turns".strip())
+    conn = chat_memory_schema.connect(str(tmp_path / "chat_memory.db"))
+    memory = SemanticMemory(conn, KeywordEmbedding(), candidate_pool=20)
+
+    # The old turns match the query best, so before compaction they fill the whole candidate pool
+    old_ids = [save_turn(conn, memory, "s1", f"printer jam {i}", "Clear the tray") for i in range(30)]
+    live_ids = [save_turn(conn, memory, "s1", f"vpn and printer {i}", "Reconnect") for i in range(5)]
+    assert {turn["id"] for turn in memory.retrieve("s1", "printer", token_budget=10_000)} <= set(old_ids)
+
+    archived = memory_compaction.compact_session(conn, "s1", keep_recent=5, batch_size=8, semantic_memory=memory)
+
+    assert archived == len(old_ids)
+    turns = memory.retrieve("s1", "printer", token_budget=10_000)
+    assert sorted(turn["id"] for turn in turns) == live_ids
+    conn.close()
+
+
+def test_forget_without_ids_drops_the_session_index(tmp_path):
+    conn = chat_memory_schema.connect(str(tmp_path / "chat_memory.db"))
+    memory = SemanticMemory(conn, KeywordEmbedding())
+    save_turn(conn, memory, "s1", "email bounce", "Check the MX record")
+    assert memory.retrieve("s1", "email")
+
+    conn.execute("DELETE FROM chat_memory WHERE session_id = ?", ("s1",))
+    conn.commit()
+    memory.forget("s1")
+
+    assert memory.retrieve("s1", "email") == []
+    conn.close()
@@ -4,7 +4,7 @@ from sentence_transformers import SentenceTransformer, util
 from fuzzywuzzy import process
 import ollama
 import numpy as np
-import sqlite3
+import chat_memory_schema
 import matplotlib.pyplot as plt
 import seaborn as sns
 from rich.console import Console
@@ -27,17 +27,8 @@ df_observations_free_text = pd.read_excel(observations_free_text_file)
 df_observations_with_entities = pd.read_excel(observations_with_entities_file)
 
 # SQLite Database Setup
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chat_memory (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_query TEXT,
-    ai_response TEXT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-conn.commit()
 
 
 def save_memory(user_query, ai_response):
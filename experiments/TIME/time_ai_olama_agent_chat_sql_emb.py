@@ -1,12 +1,16 @@
 import pandas as pd
-import sqlite3
-import ollama
+import chat_memory_schema
 import json
 import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer, util
 from rich.console import Console
 from rich.table import Table
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ollama_client import OllamaClient
 
 # Load NLP Model for Embeddings
 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -32,6 +36,15 @@ Company XYZ IT Guidelines:
 - Compliance with ISO 27001 is mandatory for all systems.
 """
 
+# Static system context: identical on every call, so Ollama reuses its evaluated prefix (roles and questions go after it)
+static_system_context = f"""
+You are an AI specialized in IT evaluations.
+
+Consider the following local IT policies first:
+{local_context}
+"""
+ollama_client = OllamaClient("llama3.2")  # keeps the model resident between questions
+
 # Define AI Expert Roles
 roles = {
     "Security Analyst": "Focus on identifying security vulnerabilities, compliance risks, and mitigation strategies.",
@@ -42,18 +55,8 @@ roles = {
 }
 
 # SQLite Database Setup
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chat_memory (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_query TEXT,
-    ai_response TEXT,
-    role TEXT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-conn.commit()
 
 
 def save_memory(user_query, ai_response, role):
@@ -97,14 +100,9 @@ def ollama_classify(query, role):
     role_context = roles.get(role, "General IT Analyst.")
 
     prompt = f"""
-    You are an AI {role}. Your role is to {role_context}
-
     The user has asked the following question:
     "{query}"
 
-    Consider the following local IT policies first:
-    {local_context}
-
     Based on these policies and the most relevant IT system observation found via semantic search, provide a classification and recommendation.
 
     Most Relevant Observation (Similarity {similarity_score:.2f}):
@@ -113,11 +111,8 @@ def ollama_classify(query, role):
     Suggested Action:
     {best_suggestion}
     """
-    response = ollama.chat(
-        model="llama3.2",
-        messages=[{"role": "system", "content": f"You are an AI {role} specialized in IT evaluations."},
-                  {"role": "user", "content": prompt}]
-    )
+    response = ollama_client.chat(ollama_client.build_messages(
+        static_system_context, prompt, instructions=f"You are an AI {role}. Your role is to {role_context}"))
 
     return response["message"].get("content", "No AI response")
 
@@ -152,6 +147,8 @@ def chatbot():
 
 # Start chatbot interaction
 if __name__ == "__main__":
+    ollama_client.warm_up()
     chatbot()
+    print(ollama_client.report())
     conn.close()
 
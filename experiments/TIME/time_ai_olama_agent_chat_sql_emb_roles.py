@@ -1,6 +1,5 @@
 import pandas as pd
-import sqlite3
-import ollama
+import chat_memory_schema
 import json
 import numpy as np
 import torch
@@ -8,6 +7,11 @@ from sentence_transformers import SentenceTransformer, util
 from rich.console import Console
 from rich.table import Table
 import threading
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ollama_client import OllamaClient
 
 # Load NLP Model for Embeddings
 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -52,19 +56,21 @@ response_tip = """
 5️⃣ Keep responses **concise yet informative**.
 """
 
+# Static system context: identical on every call, so Ollama reuses its evaluated prefix (roles and questions go after it)
+static_system_context = f"""
+You are an AI specialized in IT evaluations.
+
+Consider the following local IT policies first:
+{local_context}
+
+{response_tip}
+"""
+ollama_client = OllamaClient("llama3.2")  # keeps the model resident between questions
+
 # SQLite Database Setup
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
 
-# Ensure chat_memory table has required columns
-cursor.execute("PRAGMA table_info(chat_memory)")
-columns = [col[1] for col in cursor.fetchall()]
-if "role" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN role TEXT")
-if "feedback" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN feedback INTEGER DEFAULT 0")
-conn.commit()
-
 
 def save_memory(user_query, ai_response, role):
     cursor.execute("INSERT INTO chat_memory (user_query, ai_response, role) VALUES (?, ?, ?)",
@@ -113,16 +119,9 @@ def agent_response(query, role):
     role_context = roles.get(role, "General IT Analyst.")
 
     prompt = f"""
-    You are an AI {role}. Your role is to {role_context}
-
     The user has asked the following question:
     "{query}"
 
-    Consider the following local IT policies first:
-    {local_context}
-
-    {response_tip}
-
     Based on these policies and the most relevant IT system observation found via semantic search, provide a classification and recommendation.
 
     Most Relevant Observation (Similarity {similarity_score:.2f}):
@@ -131,11 +130,8 @@ def agent_response(query, role):
     Suggested Action:
     {best_suggestion}
     """
-    response = ollama.chat(
-        model="llama3.2",
-        messages=[{"role": "system", "content": f"You are an AI {role} specialized in IT evaluations."},
-                  {"role": "user", "content": prompt}]
-    )
+    response = ollama_client.chat(ollama_client.build_messages(
+        static_system_context, prompt, instructions=f"You are an AI {role}. Your role is to {role_context}"))
 
     return role, response["message"].get("content", "No AI response")
 
@@ -182,5 +178,7 @@ def chatbot():
 
 # Start chatbot interaction
 if __name__ == "__main__":
+    ollama_client.warm_up()
     chatbot()
+    print(ollama_client.report())
     conn.close()
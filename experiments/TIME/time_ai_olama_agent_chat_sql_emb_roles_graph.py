@@ -1,5 +1,5 @@
 import pandas as pd
-import sqlite3
+import chat_memory_schema
 import ollama
 import json
 import numpy as np
@@ -54,20 +54,9 @@ response_tip = """
 """
 
 # SQLite Database Setup with Adaptive Memory
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
 
-# Ensure chat_memory table has required columns for adaptive memory
-cursor.execute("PRAGMA table_info(chat_memory)")
-columns = [col[1] for col in cursor.fetchall()]
-if "role" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN role TEXT")
-if "feedback" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN feedback INTEGER DEFAULT 0")
-if "session_id" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN session_id TEXT")
-conn.commit()
-
 # Initialize LangGraph
 graph = Graph()
 
@@ -1,23 +1,38 @@
 import pandas as pd
-import sqlite3
-import ollama
-import json
-import numpy as np
+import chat_memory_schema
+import observation_index
+from metadata_store import MetadataStore
+from hybrid_retriever import HybridRetriever
+import document_ingestion
 import torch
 from sentence_transformers import SentenceTransformer, util
 from rich.console import Console
 from rich.table import Table
 import threading
-from langgraph.graph import StateGraph, START
+import time
+from typing import Annotated
+from langgraph.graph import StateGraph, START, END
 from pydantic import BaseModel
-import faiss
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.node_metrics import NodeMetrics
+from common.ollama_client import OllamaClient
+
+
+def merge_dicts(left, right):
+    """Reducer for state keys written by parallel branches."""
+    return {**(left or {}), **(right or {})}
 
 
 # Define the schema for graph state
 class GraphState(BaseModel):
     query: str
-    response: dict
+    response: Annotated[dict, merge_dicts] = {}
+    relevant_document: str = ""
+    observations: list = []
+    timings: Annotated[dict, merge_dicts] = {}  # node name -> wall seconds for this invocation
 
 
 # Load NLP Model for Embeddings
@@ -29,134 +44,191 @@ observations_free_text_file = "observations_free_text_TIME.xlsx"
 observations_with_entities_file = "observations_with_entities_TIME.xlsx"
 db_file = "chat_memory.db"
 document_embeddings_file = "document_embeddings.index"
-document_metadata_file = "document_metadata.json"
+document_metadata_file = "document_metadata.db"
 
 # Read Excel files
 df_rules = pd.read_excel(rules_file)
 df_observations_free_text = pd.read_excel(observations_free_text_file)
 df_observations_with_entities = pd.read_excel(observations_with_entities_file)
 
+# Local IT Context
+local_context = """
+Company XYZ IT Guidelines:
+- Security is the top priority. Any vulnerabilities must be flagged immediately.
+- Legacy systems should be evaluated for migration every 6 months.
+- Cloud-based solutions are preferred over on-premise infrastructure.
+- Performance degradation beyond 10% over 3 months is considered critical.
+- Compliance with ISO 27001 is mandatory for all systems.
+"""
+
+# Define AI Expert Roles
+roles = {
+    "Security Analyst": "Focus on identifying security vulnerabilities, compliance risks, and mitigation strategies.",
+    "Cloud Engineer": "Evaluate cloud-based solutions, performance, and scalability recommendations.",
+    "IT Manager": "Balance cost, risk, and long-term IT strategy for efficient system operations.",
+    "DevOps Specialist": "Optimize CI/CD pipelines, automation, and system performance.",
+    "Database Administrator": "Analyze database performance, integrity, and scalability issues."
+}
+
+# Response Formatting Tip
+response_tip = """
+[Tip for AI Response:]
+1️⃣ Start with a **clear classification** of the issue (e.g., Security Risk, Performance Concern, Cost Optimization, etc.).
+2️⃣ Provide **a structured response** with specific recommendations.
+3️⃣ List **at least 3 actionable steps** to address the issue.
+4️⃣ Ensure compliance with **Company XYZ IT Guidelines**.
+5️⃣ Keep responses **concise yet informative**.
+"""
+
+# Static system context: identical on every call, so Ollama reuses its evaluated prefix (roles and questions go after it)
+static_system_context = f"""
+You are an AI specialized in IT evaluations.
+
+Consider the following local IT policies first:
+{local_context}
+
+{response_tip}
+"""
+ollama_client = OllamaClient("llama3.2")  # keeps the model resident between questions
+
 # SQLite Database Setup with Adaptive Memory
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
 
-# Ensure chat_memory table has required columns for adaptive memory
-cursor.execute("PRAGMA table_info(chat_memory)")
-columns = [col[1] for col in cursor.fetchall()]
-if "role" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN role TEXT")
-if "feedback" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN feedback INTEGER DEFAULT 0")
-if "session_id" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN session_id TEXT")
-conn.commit()
-
 # Initialize FAISS for Document Retrieval
 embedding_dim = 384  # Assuming MiniLM model output size
-if os.path.exists(document_embeddings_file):
-    document_index = faiss.read_index(document_embeddings_file)
-    with open(document_metadata_file, "r") as f:
-        document_metadata = json.load(f)
-else:
-    document_index = faiss.IndexFlatL2(embedding_dim)
-    document_metadata = []
+document_metadata = MetadataStore(document_metadata_file)
+document_index = observation_index.load(document_embeddings_file, document_metadata, embedding_dim)
+retriever = HybridRetriever(document_index, document_metadata, embedding_model)
 
 
 def index_observations():
-    """Indexes IT Observations into FAISS for retrieval."""
-    global document_index, document_metadata
+    """Incrementally syncs IT Observations into FAISS and BM25: only new or changed rows are processed."""
+    (added, updated, removed), _ = retriever.sync(df_observations_free_text)
+
+    if added or updated or removed:
+        observation_index.save(document_index, document_embeddings_file, document_metadata)
 
-    # Reset FAISS to avoid duplicate indexing
-    document_index.reset()
-    document_metadata = []
+    print(f"✅ FAISS + BM25 indexes ready with {document_index.ntotal} observations "
+          f"(+{added} new, ~{updated} changed, -{removed} removed)")
 
-    new_embeddings = []
-    new_metadata = []
 
-    for idx, row in df_observations_free_text.iterrows():
-        text = row["Observation_Text"]
-        embedding = embedding_model.encode(text, convert_to_tensor=False)
+# Ensure IT Observations are indexed at startup
+index_observations()
 
-        new_embeddings.append(embedding)
-        new_metadata.append({
-            "id": len(document_metadata) + idx,
-            "text": text,
-            "category": row.get("Category", "General"),
-            "suggestion": row.get("Suggested_Action", "No suggestion available.")
-        })
+# Policy document corpus, built by the separate ingestion step `python document_ingestion.py --docs ...`
+# (its embedding process pool must not start from this script, whose module-level code loads models)
+policy_index = document_ingestion.load_index(document_ingestion.policy_index_file, embedding_dim)
+policy_metadata = MetadataStore(document_ingestion.policy_metadata_file)
 
-    # Add embeddings to FAISS
-    if new_embeddings:
-        document_index.add(np.array(new_embeddings, dtype=np.float32))
-        document_metadata.extend(new_metadata)
 
-        # Save FAISS index
-        faiss.write_index(document_index, document_embeddings_file)
-        with open(document_metadata_file, "w") as f:
-            json.dump(document_metadata, f)
+def retrieve_relevant_document(query, k=2):
+    """Finds the policy document chunks most relevant to the query."""
+    query_embedding = observation_index.encode(embedding_model, [query])
+    matches = document_ingestion.retrieve_documents(policy_index, policy_metadata, query_embedding, k=k)
+    if not matches:
+        return "No relevant document found."
+    return "\n".join(f"[{record['source']} #{record['chunk']}, {score:.2f}] {record['text']}"
+                     for record, score in matches)
 
-    print(f"✅ FAISS Reindexed with {document_index.ntotal} observations!")
-    print(f"🔍 Stored Observations in FAISS Metadata: {json.dumps(document_metadata, indent=2)}")
 
+# Retrieval settings: how many observations a prompt gets, hybrid (BM25 + vector) or vector-only with MMR
+top_k_observations = 3
+use_hybrid = True
+use_mmr = True
 
-# Ensure IT Observations are indexed at startup
-index_observations()
+
+def find_relevant_observations(query, k=top_k_observations):
+    """Finds the k most relevant IT observations (hybrid lexical + semantic, or cosine re-ranked for diversity)."""
+    if use_hybrid:
+        hits = retriever.search(query, k=k)
+        return [(record["text"], record["suggestion"], vector_score) for record, _, vector_score in hits]
+
+    query_embedding = observation_index.encode(embedding_model, [query])
+    hits = observation_index.search(document_index, document_metadata, query_embedding, k=k, use_mmr=use_mmr)
+    return [(record["text"], record["suggestion"], score) for record, _, score in hits]
 
 
 def find_most_relevant_observation(query):
     """Finds the most relevant IT observation based on semantic similarity."""
-
-    if document_index.ntotal == 0:
+    matches = find_relevant_observations(query, k=1)
+    if not matches:
         return "No relevant observation found.", "No suggestion available.", 0.0
+    return matches[0]
+
+
+# Aggregated across invocations (histograms, CPU time, LLM calls/tokens); exported when the chatbot exits
+graph_metrics = NodeMetrics("time_graph_rag")
+
+
+def timed(name, node):
+    """Wraps a graph node so its wall time lands in state.timings and in graph_metrics under its name."""
+
+    def wrapper(state: GraphState):
+        start = time.perf_counter()
+        update = node(state)
+        update["timings"] = {name: time.perf_counter() - start}
+        return update
 
-    query_embedding = embedding_model.encode(query, convert_to_tensor=False).reshape(1, -1).astype(np.float32)
-    distances, indices = document_index.search(query_embedding, 1)
+    return graph_metrics.instrument(name, wrapper)
 
-    print(f"🔎 FAISS Search Debugging: Distance={distances[0][0]} Index={indices[0][0]}")  # Debugging
 
-    # Convert L2 distance to a similarity score (higher is better)
-    max_distance = 2.0  # Approximate max distance for normalization
-    similarity_score = max(0, 1.0 - (distances[0][0] / max_distance))
+def retrieve_documents_node(state: GraphState):
+    """Retrieves relevant policy document snippets."""
+    return {"relevant_document": retrieve_relevant_document(state.query)}
 
-    if similarity_score > 0.4 and indices[0][0] < len(document_metadata):  # Ensure valid match
-        best_match = document_metadata[indices[0][0]]
-        best_observation = best_match["text"]
-        best_suggestion = best_match["suggestion"]
-    else:
-        best_observation, best_suggestion, similarity_score = "No relevant observation found.", "No suggestion available.", 0.0
 
-    return best_observation, best_suggestion, similarity_score
+def retrieve_observations_node(state: GraphState):
+    """Retrieves several relevant, diverse IT observations."""
+    return {"observations": find_relevant_observations(state.query)}
 
 
-def process_query(state: GraphState):
-    """Handles user query and returns a structured AI response."""
-    query = state.query
+def make_role_node(role):
+    """Builds the node in which one AI role answers using the retrieved context."""
 
-    # Retrieve relevant document snippet
-    relevant_doc = retrieve_relevant_document(query)
+    def role_node(state: GraphState):
+        observation_lines = "\n".join(
+            f"- {text} (Relevance {score:.2f}) Suggested Action: {suggestion}"
+            for text, suggestion, score in state.observations) or "No relevant observation found."
 
-    # Retrieve the most relevant IT observation
-    best_observation, best_suggestion, similarity_score = find_most_relevant_observation(query)
+        prompt = f"""
+    The user has asked the following question:
+    "{state.query}"
 
-    # Format AI Response
-    ai_response = {
-        "IT Manager": f"Query: {query}\n\n🔍 Most Relevant Observation: {best_observation}\n"
-                      f"💡 Suggested Action: {best_suggestion}\n"
-                      f"📊 Similarity Score: {similarity_score:.2f}\n"
-                      f"📄 Relevant Document: {relevant_doc}"
-    }
+    Relevant Policy Documents:
+    {state.relevant_document}
 
-    return GraphState(query=query, response=ai_response)
+    Most Relevant Observations:
+    {observation_lines}
+    """
+        response = ollama_client.chat(ollama_client.build_messages(
+            static_system_context, prompt, instructions=f"You are an AI {role}. Your role is to {roles[role]}"))
+        return {"response": {role: response["message"].get("content", "No AI response")}}
 
+    return role_node
 
-# Initialize LangGraph
+
+def aggregate_node(state: GraphState):
+    """Collects the role answers in a stable order, filling in roles that produced nothing."""
+    return {"response": {role: state.response.get(role, "No AI response") for role in roles}}
+
+
+# Initialize LangGraph: retrieval branches run in parallel, then one parallel branch per role, then aggregation
 graph = StateGraph(state_schema=GraphState)
 
-# Add nodes (functions)
-graph.add_node("ProcessQuery", process_query)
+graph.add_node("RetrieveDocuments", timed("RetrieveDocuments", retrieve_documents_node))
+graph.add_node("RetrieveObservations", timed("RetrieveObservations", retrieve_observations_node))
+graph.add_node("Aggregate", timed("Aggregate", aggregate_node))
+graph.add_edge(START, "RetrieveDocuments")
+graph.add_edge(START, "RetrieveObservations")
 
-# Define entry point: Start from "ProcessQuery"
-graph.set_entry_point("ProcessQuery")
+for role in roles:
+    graph.add_node(role, timed(role, make_role_node(role)))
+    # A list of sources makes the role wait for both retrieval branches
+    graph.add_edge(["RetrieveDocuments", "RetrieveObservations"], role)
+
+graph.add_edge(list(roles), "Aggregate")
+graph.add_edge("Aggregate", END)
 
 # Compile LangGraph
 graph_executor = graph.compile()
@@ -177,13 +249,23 @@ def chatbot():
             break
 
         # Process query through LangGraph
-        results = graph_executor.invoke(GraphState(query=user_input, response={}))
+        start = time.perf_counter()
+        results = graph_executor.invoke(GraphState(query=user_input))
+        total = time.perf_counter() - start
 
         # ✅ Corrected Access to Response Dictionary
         for role, response in results["response"].items():
             console.print(f"🤖 [bold cyan]{role}:[/bold cyan] {response}\n", style="bold yellow")
 
+        timings = ", ".join(f"{node} {seconds:.2f}s" for node, seconds in results["timings"].items())
+        console.print(f"⏱️ Total {total:.2f}s | {timings}", style="dim")
+
 
 if __name__ == "__main__":
+    if policy_index.ntotal == 0:
+        print("⚠️ No policy documents indexed; run `python document_ingestion.py` first to enable document RAG")
+    ollama_client.warm_up()
     chatbot()
+    print(ollama_client.report())
+    graph_metrics.export("langgraph_metrics_graph_rag")
     conn.close()
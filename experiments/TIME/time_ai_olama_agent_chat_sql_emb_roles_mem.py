@@ -1,6 +1,7 @@
 import pandas as pd
-import sqlite3
-import ollama
+import chat_memory_schema
+from semantic_memory import SemanticMemory
+import memory_compaction
 import json
 import numpy as np
 import torch
@@ -8,6 +9,11 @@ from sentence_transformers import SentenceTransformer, util
 from rich.console import Console
 from rich.table import Table
 import threading
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ollama_client import OllamaClient
 
 # Load NLP Model for Embeddings
 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -52,26 +58,33 @@ response_tip = """
 5️⃣ Keep responses **concise yet informative**.
 """
 
+# Static system context: identical on every call, so Ollama reuses its evaluated prefix (roles and questions go after it)
+static_system_context = f"""
+You are an AI specialized in IT evaluations.
+
+Consider the following local IT policies first:
+{local_context}
+
+{response_tip}
+"""
+ollama_client = OllamaClient("llama3.2")  # keeps the model resident between questions
+
 # SQLite Database Setup with Adaptive Memory
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
 
-# Ensure chat_memory table has required columns for adaptive memory
-cursor.execute("PRAGMA table_info(chat_memory)")
-columns = [col[1] for col in cursor.fetchall()]
-if "role" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN role TEXT")
-if "feedback" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN feedback INTEGER DEFAULT 0")
-if "session_id" not in columns:
-    cursor.execute("ALTER TABLE chat_memory ADD COLUMN session_id TEXT")
-conn.commit()
+# Long-term memory: past turns are retrieved by meaning, not just by recency
+semantic_memory = SemanticMemory(conn, embedding_model)
+memory_token_budget = 512
 
 
 def save_memory(session_id, user_query, ai_response, role):
     cursor.execute("INSERT INTO chat_memory (session_id, user_query, ai_response, role) VALUES (?, ?, ?, ?)",
                    (session_id, user_query, ai_response, role))
     conn.commit()
+    memory_id = cursor.lastrowid
+    semantic_memory.add(memory_id, session_id, user_query, ai_response)
+    return memory_id
 
 
 def save_feedback(response_id, feedback):
@@ -88,7 +101,10 @@ def retrieve_memory(session_id, limit=5):
 
 def clear_memory(session_id):
     cursor.execute("DELETE FROM chat_memory WHERE session_id = ?", (session_id,))
+    cursor.execute("DELETE FROM chat_memory_summary WHERE session_id = ?", (session_id,))
+    cursor.execute("DELETE FROM chat_memory_archive WHERE session_id = ?", (session_id,))
     conn.commit()
+    semantic_memory.forget(session_id)
 
 
 def find_most_relevant_observation(query):
@@ -110,22 +126,15 @@ def find_most_relevant_observation(query):
     return similarities[0] if similarities else ("No relevant observations found.", "", 0)
 
 
-def agent_response(query, role):
+def agent_response(query, role, memory_context="No relevant past conversations.", session_summary=""):
     """Each AI role provides its response."""
     best_observation, best_suggestion, similarity_score = find_most_relevant_observation(query)
     role_context = roles.get(role, "General IT Analyst.")
 
     prompt = f"""
-    You are an AI {role}. Your role is to {role_context}
-
     The user has asked the following question:
     "{query}"
 
-    Consider the following local IT policies first:
-    {local_context}
-
-    {response_tip}
-
     Based on these policies and the most relevant IT system observation found via semantic search, provide a classification and recommendation.
 
     Most Relevant Observation (Similarity {similarity_score:.2f}):
@@ -133,23 +142,31 @@ def agent_response(query, role):
 
     Suggested Action:
     {best_suggestion}
+
+    Summary of Earlier Conversation:
+    {session_summary}
+
+    Relevant Past Conversations:
+    {memory_context}
     """
-    response = ollama.chat(
-        model="llama3.2",
-        messages=[{"role": "system", "content": f"You are an AI {role} specialized in IT evaluations."},
-                  {"role": "user", "content": prompt}]
-    )
+    response = ollama_client.chat(ollama_client.build_messages(
+        static_system_context, prompt, instructions=f"You are an AI {role}. Your role is to {role_context}"))
 
     return role, response["message"].get("content", "No AI response")
 
 
-def multi_agent_classification(query):
+def multi_agent_classification(query, session_id):
     """Runs multiple AI roles in parallel and aggregates responses."""
     threads = []
     responses = {}
 
+    # Retrieve once on the main thread; the SQLite connection is not shared with workers
+    past_turns = semantic_memory.retrieve(session_id, query, token_budget=memory_token_budget)
+    memory_context = semantic_memory.format_context(past_turns)
+    session_summary = memory_compaction.retrieve_summary(conn, session_id) or "None yet."
+
     def worker(role):
-        responses[role] = agent_response(query, role)
+        responses[role] = agent_response(query, role, memory_context, session_summary)
 
     for role in roles.keys():
         thread = threading.Thread(target=worker, args=(role,))
@@ -176,12 +193,17 @@ def chatbot():
             console.print("[bold red]Goodbye! Have a great day! 👋[/bold red]")
             break
 
-        agent_responses = multi_agent_classification(user_input)
+        agent_responses = multi_agent_classification(user_input, session_id)
         for role, (role_name, response) in agent_responses.items():
             console.print(f"🤖 [bold cyan]{role_name}:[/bold cyan] {response}\n", style="bold yellow")
             save_memory(session_id, user_input, response, role_name)
 
 
 if __name__ == "__main__":
+    # Keep long-running sessions within budget without blocking the chat loop
+    stop_compaction = memory_compaction.start_background_compaction(db_file, semantic_memory=semantic_memory)
+    ollama_client.warm_up()
     chatbot()
+    print(ollama_client.report())
+    stop_compaction.set()
     conn.close()
@@ -1,5 +1,6 @@
 import pandas as pd
-import sqlite3
+import chat_memory_schema
+from hybrid_retriever import BM25Index
 import ollama
 import json
 from rich.console import Console
@@ -28,18 +29,14 @@ if "OLLAMA_Suggestion" not in df_observations_free_text.columns:
         )["message"]["content"] if text else "No AI response"
     )
 
+# Lexical index over observation text: system names and error codes resolve without scanning the frame
+observation_bm25 = BM25Index()
+for idx, text in df_observations_free_text["Observation_Text"].items():
+    observation_bm25.add(idx, text)
+
 # SQLite Database Setup
-conn = sqlite3.connect(db_file)
+conn = chat_memory_schema.connect(db_file)
 cursor = conn.cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chat_memory (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_query TEXT,
-    ai_response TEXT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-conn.commit()
 
 
 def save_memory(user_query, ai_response):
@@ -62,8 +59,8 @@ def get_relevant_observations(query):
     if "Observation_Text" not in df_observations_free_text.columns or "OLLAMA_Suggestion" not in df_observations_free_text.columns:
         return "No relevant observations found."
 
-    filtered_df = df_observations_free_text[
-        df_observations_free_text["Observation_Text"].str.contains(query, case=False, na=False)]
+    matches = observation_bm25.search(query, k=5)
+    filtered_df = df_observations_free_text.loc[[idx for idx, _ in matches]]
     return filtered_df[['Observation_Text', 'OLLAMA_Suggestion']].to_string(
         index=False) if not filtered_df.empty else "No relevant observations found."
 
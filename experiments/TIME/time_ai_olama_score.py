@@ -1,36 +1,34 @@
+import functools
+import os
+import sys
+
 import pandas as pd
-import spacy
-from sentence_transformers import SentenceTransformer, util
-from fuzzywuzzy import process
 import ollama
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from rich.console import Console
 from rich.table import Table
 
-# Load NLP Models
-nlp = spacy.load("en_core_web_sm")
-sbert_model = SentenceTransformer("all-MiniLM-L6-v2")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.lazy_import import lazy_import
+
+# Imported on first use (embed_text): the classification and scoring below never need it
+sentence_transformers = lazy_import("sentence_transformers")
+
 console = Console()
 
-# Load TIME framework rules
-rules_file = "rules_multi_factor_TIME.xlsx"
 observations_free_text_file = "observations_free_text_TIME.xlsx"
 observations_with_entities_file = "observations_with_entities_TIME.xlsx"
 
-# Read Excel files
-df_rules = pd.read_excel(rules_file)
-df_observations_free_text = pd.read_excel(observations_free_text_file)
-df_observations_with_entities = pd.read_excel(observations_with_entities_file)
+
+@functools.lru_cache(maxsize=None)
+def sbert_model():
+    """SBERT is loaded the first time an embedding is requested."""
+    return sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
 
 
 # Convert rules into embeddings for semantic matching
 def embed_text(text):
-    return sbert_model.encode(text, convert_to_tensor=True)
-
-
-df_rules["Condition_Embedding"] = df_rules["Condition"].apply(embed_text)
+    return sbert_model().encode(text, convert_to_tensor=True)
 
 
 def ollama_classify(observation_text):
@@ -63,10 +61,6 @@ def classify_free_text_observation(observation_text):
     return ollama_classify(observation_text)
 
 
-# Process free-text observations
-df_observations_free_text["OLLAMA_Suggestion"] = df_observations_free_text["Observation_Text"].apply(
-    classify_free_text_observation)
-
 # Ranking Model - Assigning Scores
 severity_mapping = {"Critical": 5, "High": 4, "Medium": 3, "Low": 2, "Info": 1}
 recurrence_mapping = {"Frequent": 5, "Often": 4, "Occasionally": 3, "Rare": 2, "First Time": 1}
@@ -85,43 +79,57 @@ def rank_observation(row):
     return round(score, 2)
 
 
-# Adding ranking columns
-df_observations_free_text["Severity"] = np.random.choice(list(severity_mapping.keys()), len(df_observations_free_text))
-df_observations_free_text["Recurrence"] = np.random.choice(list(recurrence_mapping.keys()),
-                                                           len(df_observations_free_text))
-df_observations_free_text["Anomaly"] = np.random.choice(list(anomaly_mapping.keys()), len(df_observations_free_text))
-df_observations_free_text["Time Sensitivity"] = np.random.choice(list(time_mapping.keys()),
-                                                                 len(df_observations_free_text))
-df_observations_free_text["Relevance_Score"] = df_observations_free_text.apply(rank_observation, axis=1)
-
-# Sort observations by relevance score
-df_observations_free_text = df_observations_free_text.sort_values(by="Relevance_Score", ascending=False)
-
-# Combine results for reporting
-df_results = pd.concat([
-    df_observations_free_text[
-        ['Observation_ID', 'Observation_Text', 'OLLAMA_Suggestion', 'Severity', 'Recurrence', 'Anomaly',
-         'Time Sensitivity', 'Relevance_Score']].rename(columns={'Observation_Text': 'Description'}),
-    df_observations_with_entities[['Observation_ID', 'Entity', 'Metric', 'Value', 'Suggested_Action']].rename(
-        columns={'Entity': 'Description'})
-])
-
-# Generate classification summary
-classification_counts = df_results['OLLAMA_Suggestion'].value_counts()
-
-# Display colorful summary table in console
-table = Table(title="IT Systems TIME Classification Summary")
-table.add_column("Category", style="bold blue")
-table.add_column("Count", style="bold yellow")
-for category, count in classification_counts.items():
-    table.add_row(category, str(count))
-console.print(table)
-
-# Save Excel report
-report_file = "IT_Systems_TIME_Report.xlsx"
-with pd.ExcelWriter(report_file, engine='xlsxwriter') as writer:
-    df_results.to_excel(writer, sheet_name="TIME Classification", index=False)
-
-print(
-    "\nProcessing completed! TIME classifications applied with OLLAMA insights and ranking model. Reports generated in Excel.")
-
+def main():
+    # Read Excel files
+    df_observations_free_text = pd.read_excel(observations_free_text_file)
+    df_observations_with_entities = pd.read_excel(observations_with_entities_file)
+
+    # Process free-text observations
+    df_observations_free_text["OLLAMA_Suggestion"] = df_observations_free_text["Observation_Text"].apply(
+        classify_free_text_observation)
+
+    # Adding ranking columns
+    df_observations_free_text["Severity"] = np.random.choice(list(severity_mapping.keys()),
+                                                             len(df_observations_free_text))
+    df_observations_free_text["Recurrence"] = np.random.choice(list(recurrence_mapping.keys()),
+                                                               len(df_observations_free_text))
+    df_observations_free_text["Anomaly"] = np.random.choice(list(anomaly_mapping.keys()),
+                                                            len(df_observations_free_text))
+    df_observations_free_text["Time Sensitivity"] = np.random.choice(list(time_mapping.keys()),
+                                                                     len(df_observations_free_text))
+    df_observations_free_text["Relevance_Score"] = df_observations_free_text.apply(rank_observation, axis=1)
+
+    # Sort observations by relevance score
+    df_observations_free_text = df_observations_free_text.sort_values(by="Relevance_Score", ascending=False)
+
+    # Combine results for reporting
+    df_results = pd.concat([
+        df_observations_free_text[
+            ['Observation_ID', 'Observation_Text', 'OLLAMA_Suggestion', 'Severity', 'Recurrence', 'Anomaly',
+             'Time Sensitivity', 'Relevance_Score']].rename(columns={'Observation_Text': 'Description'}),
+        df_observations_with_entities[['Observation_ID', 'Entity', 'Metric', 'Value', 'Suggested_Action']].rename(
+            columns={'Entity': 'Description'})
+    ])
+
+    # Generate classification summary
+    classification_counts = df_results['OLLAMA_Suggestion'].value_counts()
+
+    # Display colorful summary table in console
+    table = Table(title="IT Systems TIME Classification Summary")
+    table.add_column("Category", style="bold blue")
+    table.add_column("Count", style="bold yellow")
+    for category, count in classification_counts.items():
+        table.add_row(category, str(count))
+    console.print(table)
+
+    # Save Excel report
+    report_file = "IT_Systems_TIME_Report.xlsx"
+    with pd.ExcelWriter(report_file, engine='xlsxwriter') as writer:
+        df_results.to_excel(writer, sheet_name="TIME Classification", index=False)
+
+    print("\nProcessing completed! TIME classifications applied with OLLAMA insights and ranking model. "
+          "Reports generated in Excel.")
+
+
+if __name__ == "__main__":
+    main()
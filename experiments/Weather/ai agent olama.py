@@ -1,6 +1,19 @@
+import os
 import re
+import sys
 import ollama
 import pandas as pd
+from structured_output import WeatherAnalysis, generate_structured, schema_instructions
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_backend import LLMClient, OllamaBackend
+
+# Structured mode asks for schema-constrained JSON and retries only rows that fail validation;
+# WEATHER_STRUCTURED_OUTPUT=0 falls back to free-form replies parsed with regexes
+STRUCTURED_OUTPUT = os.getenv("WEATHER_STRUCTURED_OUTPUT", "1") == "1"
+structured_client = LLMClient(OllamaBackend("llama3.2", format=WeatherAnalysis.model_json_schema(),
+                                            options={"temperature": 0}),
+                              max_workers=int(os.getenv("LLM_MAX_WORKERS", "4"))) if STRUCTURED_OUTPUT else None
 
 # ✅ Load observations from Excel
 observations_file = "observations_free_text.xlsx"
@@ -31,6 +44,20 @@ class WeatherClassificationAgent:
         response = ollama.chat(model="llama3.2", messages=[{"role": "user", "content": prompt}])
         return response.message.content
 
+    @staticmethod
+    def classify_weather_structured(rows):
+        """One validated WeatherAnalysis (or None) per row, requested concurrently."""
+        conversations = [[{"role": "user", "content": f"""
+        Classify the weather conditions and provide recommendations:
+        - Sky: {row["Sky Condition"]}
+        - Rain: {row["Rain Condition"]}
+        - Wind: {row["Wind Condition"]}
+        - Observation: {row["Free Text Observation"]}
+
+        {schema_instructions()}
+        """}] for row in rows]
+        return generate_structured(conversations, lambda batch: structured_client.chat_many(batch, on_error=lambda e: ""))
+
 
 class RecommendationAgent:
     """Extracts AI-generated recommendations and explanations"""
@@ -57,6 +84,14 @@ class RecommendationAgent:
         details["AI Explanation"] = ai_response_text.strip()
         return details
 
+    @staticmethod
+    def details_from_structured(analysis, ai_response_text):
+        """Report columns from a validated reply; rows that never validated keep the raw reply as explanation."""
+        if analysis is None:
+            return {"Final Classification": "", "AI-Powered Recommendations": "",
+                    "AI Explanation": ai_response_text.strip()}
+        return analysis.to_columns()
+
 
 class ContradictionDetectionAgent:
     """Identifies contradictions in observations"""
@@ -81,20 +116,26 @@ class ReportGeneratorAgent:
         print(f"✅ AI-powered multi-agent weather report saved as {report_filename}")
 
 
+# ✅ Structured mode: classify all observations up front, retrying only invalid replies
+rows = df.to_dict("records")
+if STRUCTURED_OUTPUT:
+    analyses, ai_responses = WeatherClassificationAgent.classify_weather_structured(rows)
+
 # ✅ Process each observation
-for index, row in df.iterrows():
+for index, row in enumerate(rows):
     location = row["Location"]
     sky_condition = row["Sky Condition"]
     rain_condition = row["Rain Condition"]
     wind_condition = row["Wind Condition"]
     free_text_observation = row["Free Text Observation"]
 
-    # 🌦️ **Step 1: Classify Weather**
-    ai_response_text = WeatherClassificationAgent.classify_weather(sky_condition, rain_condition, wind_condition,
-                                                                   free_text_observation)
-
-    # 🎯 **Step 2: Extract AI Details**
-    extracted_data = RecommendationAgent.extract_details(ai_response_text)
+    # 🌦️ **Step 1 + 2: Classify Weather and Extract AI Details**
+    if STRUCTURED_OUTPUT:
+        extracted_data = RecommendationAgent.details_from_structured(analyses[index], ai_responses[index])
+    else:
+        ai_response_text = WeatherClassificationAgent.classify_weather(sky_condition, rain_condition,
+                                                                       wind_condition, free_text_observation)
+        extracted_data = RecommendationAgent.extract_details(ai_response_text)
 
     # ⚡ **Step 3: Detect Contradictions**
     contradiction_warning = ContradictionDetectionAgent.detect_contradiction(sky_condition, rain_condition,
@@ -1,30 +1,33 @@
 import pandas as pd
-import spacy
 from typing import Dict, Any
+from rule_index import build_rule_index, lookup, matched_rule_name
+from entity_extraction import KeywordExtractor
 
-# Load NLP model for item extraction
-nlp = spacy.load("en_core_web_sm")
+# Keyword extraction for weather terms and items (tokenizer + PhraseMatcher, no tagger needed)
+keyword_extractor = KeywordExtractor({
+    "weather": {"rain", "sun", "snow", "storm", "wind"},
+    "items": {"umbrella", "coat", "hat", "boots", "gloves"},
+})
 
 # Load rules & observations
 df_rules = pd.read_excel("rules_multi_factor.xlsx")
 df_observations = pd.read_excel("observations_free_text.xlsx")
+rule_index = build_rule_index(df_rules)  # (sky, rain, wind, location) -> rule, with wildcard-location fallback
+
+# Extract keywords for all observations in one batched pass; item_extraction_agent reads from here
+observation_keywords = dict(zip(df_observations["Free Text Observation"],
+                                keyword_extractor.extract(df_observations["Free Text Observation"])))
 
 
 # ✅ **1️⃣ Rule Matching Agent**
 def rule_matching_agent(data: Dict[str, Any]) -> Dict[str, Any]:
     """Matches observations with predefined weather rules."""
-    match = df_rules[
-        (df_rules["Sky Condition"] == data["Sky Condition"]) &
-        (df_rules["Rain Condition"] == data["Rain Condition"]) &
-        (df_rules["Wind Condition"] == data["Wind Condition"])
-        ]
-
-    if not match.empty:
-        for _, rule in match.iterrows():
-            if rule["Location Exception"] == data["Location"]:
-                data["Final Classification"] = rule["Classification"]
-                data["Matched Rule"] = f"{rule['Sky Condition']} {rule['Rain Condition']} {rule['Wind Condition']}"
-                data["Recommendation"] = rule["Recommendation"]
+    rule = lookup(rule_index, data["Sky Condition"], data["Rain Condition"], data["Wind Condition"], data["Location"])
+
+    if rule is not None:
+        data["Final Classification"] = rule["Classification"]
+        data["Matched Rule"] = matched_rule_name(rule)
+        data["Recommendation"] = rule["Recommendation"]
 
     return data
 
@@ -32,15 +35,12 @@ def rule_matching_agent(data: Dict[str, Any]) -> Dict[str, Any]:
 # ✅ **2️⃣ Weather & Item Extraction Agent**
 def item_extraction_agent(data: Dict[str, Any]) -> Dict[str, Any]:
     """Extracts weather conditions and useful items from free text."""
-    doc = nlp(data["Free Text Observation"])
-    weather_terms = {token.text.lower() for token in doc if
-                     token.pos_ in ["NOUN", "PROPN"] and token.text.lower() in ["rain", "sun", "snow", "storm", "wind"]}
-    extracted_items = {token.text.lower() for token in doc if
-                       token.pos_ in ["NOUN", "PROPN"] and token.text.lower() in ["umbrella", "coat", "hat", "boots",
-                                                                                  "gloves"]}
-
-    data["Extracted Weather"] = ", ".join(weather_terms)
-    data["Extracted Items"] = ", ".join(extracted_items)
+    keywords = observation_keywords.get(data["Free Text Observation"])
+    if keywords is None:
+        keywords = keyword_extractor.extract([data["Free Text Observation"]])[0]
+
+    data["Extracted Weather"] = ", ".join(keywords["weather"])
+    data["Extracted Items"] = ", ".join(keywords["items"])
     return data
 
 
@@ -1,6 +1,8 @@
+import os
 import re
 import pandas as pd
 import ollama
+from structured_output import generate_structured, schema_instructions
 from langchain.chains import LLMChain, SimpleSequentialChain
 from langchain.prompts import PromptTemplate
 from langchain.llms import Ollama
@@ -12,6 +14,10 @@ df = pd.read_excel(observations_file)
 # ✅ Initialize Ollama Model
 llm = Ollama(model="llama3.2")
 
+# ✅ Structured mode: JSON-constrained model, pydantic validation, retries only for invalid rows
+STRUCTURED_OUTPUT = os.getenv("WEATHER_STRUCTURED_OUTPUT", "1") == "1"
+structured_llm = Ollama(model="llama3.2", format="json", temperature=0) if STRUCTURED_OUTPUT else None
+
 ### 🚀 **Define LangChain Agents as Chains**
 
 # 🎯 **Weather Classification Chain**
@@ -32,6 +38,49 @@ classification_prompt = PromptTemplate(
 )
 weather_classification_chain = LLMChain(llm=llm, prompt=classification_prompt)
 
+structured_classification_prompt = PromptTemplate(
+    input_variables=["sky", "rain", "wind", "observation"],
+    partial_variables={"schema": schema_instructions()},
+    template="""
+    Classify the weather conditions:
+    - Sky: {sky}
+    - Rain: {rain}
+    - Wind: {wind}
+    - Observation: {observation}
+
+    {schema}
+    """
+)
+
+
+def run_structured_llm(conversations, max_attempts=3):
+    """Sends each conversation (first prompt plus any correction turns) as one text prompt, concurrently.
+
+    A row whose call raises is re-queued on its own; the rest of the batch keeps its replies.
+    Rows that still fail after max_attempts get an empty reply, which generate_structured treats as invalid.
+    """
+    prompts = ["\n\n".join(message["content"] for message in conversation) for conversation in conversations]
+    replies = [""] * len(prompts)
+    pending = list(range(len(prompts)))
+    for attempt in range(max_attempts):
+        outputs = structured_llm.batch([prompts[i] for i in pending], return_exceptions=True,
+                                       config={"max_concurrency": int(os.getenv("LLM_MAX_WORKERS", "4"))})
+        failed = []
+        for i, output in zip(pending, outputs):
+            if isinstance(output, Exception):
+                failed.append(i)
+            else:
+                replies[i] = output
+        if failed and attempt < max_attempts - 1:
+            print(f"🔁 {len(failed)} of {len(pending)} LLM calls failed, retrying only those rows")
+        pending = failed
+        if not pending:
+            break
+    if pending:
+        print(f"⚠️ {len(pending)} LLM calls still failing after {max_attempts} attempts")
+    return replies
+
+
 # 🎯 **Contradiction Detection Chain**
 contradiction_prompt = PromptTemplate(
     input_variables=["sky", "rain", "observation"],
@@ -55,7 +104,12 @@ weather_analysis_chain = SimpleSequentialChain(
 ### 🚀 **Process Each Weather Observation**
 results = []
 
-for _, row in df.iterrows():
+if STRUCTURED_OUTPUT:
+    analyses, ai_responses = generate_structured([[{"role": "user", "content": structured_classification_prompt.format(
+        sky=row["Sky Condition"], rain=row["Rain Condition"], wind=row["Wind Condition"],
+        observation=row["Free Text Observation"])}] for _, row in df.iterrows()], run_structured_llm)
+
+for position, (_, row) in enumerate(df.iterrows()):
     location = row["Location"]
     sky_condition = row["Sky Condition"]
     rain_condition = row["Rain Condition"]
@@ -69,24 +123,30 @@ for _, row in df.iterrows():
         "wind": wind_condition,
         "observation": free_text_observation
     }
-    ai_response_text = weather_classification_chain.run(weather_input)
-
-    # 🎯 **Step 2: Extract AI Details**
     details = {
         "Final Classification": "",
         "AI-Powered Recommendations": "",
         "AI Explanation": ""
     }
-
-    classification_match = re.search(r'classify it as "(.*?)"', ai_response_text, re.IGNORECASE)
-    if classification_match:
-        details["Final Classification"] = classification_match.group(1)
-
-    recommendation_match = re.search(r'Recommendations:\n\n(.*?)\n\n', ai_response_text, re.DOTALL)
-    if recommendation_match:
-        details["AI-Powered Recommendations"] = recommendation_match.group(1).strip()
-
-    details["AI Explanation"] = ai_response_text.strip()
+    if STRUCTURED_OUTPUT:
+        # 🎯 **Step 2: Validated JSON fields (raw reply kept if the row never validated)**
+        if analyses[position] is not None:
+            details = analyses[position].to_columns()
+        else:
+            details["AI Explanation"] = ai_responses[position].strip()
+    else:
+        ai_response_text = weather_classification_chain.run(weather_input)
+
+        # 🎯 **Step 2: Extract AI Details**
+        classification_match = re.search(r'classify it as "(.*?)"', ai_response_text, re.IGNORECASE)
+        if classification_match:
+            details["Final Classification"] = classification_match.group(1)
+
+        recommendation_match = re.search(r'Recommendations:\n\n(.*?)\n\n', ai_response_text, re.DOTALL)
+        if recommendation_match:
+            details["AI-Powered Recommendations"] = recommendation_match.group(1).strip()
+
+        details["AI Explanation"] = ai_response_text.strip()
 
     # ⚡ **Step 3: Detect Contradictions via Chain**
     contradiction_warning = contradiction_chain.run({
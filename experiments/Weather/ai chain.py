@@ -2,6 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from sentence_transformers import SentenceTransformer, util
 import spacy
+from rule_index import build_rule_index, lookup
 
 # Load NLP Model (for free-text understanding)
 nlp = spacy.load("en_core_web_sm")
@@ -19,29 +20,21 @@ df_rules = pd.read_excel("rules_multi_factor.xlsx")
 # Print column names to debug
 print("Available columns in rules file:", df_rules.columns.tolist())
 
+# Hash index (sky, rain, wind, location) -> rule, with wildcard-location fallback
+rule_index = build_rule_index(df_rules)
+
 # === 2️⃣ Semantic Matching (Find Closest Rule) ===
 def match_rules(sky, rain, wind, location):
     """Find the best matching rule based on multiple weather factors."""
 
-    # Filter rules matching sky, rain, and wind conditions
-    matching_rules = df_rules[
-        (df_rules["Sky Condition"] == sky) &
-        (df_rules["Rain Condition"] == rain) &
-        (df_rules["Wind Condition"] == wind)
-        ]
+    # Location-specific exception first, then the general rule for these conditions
+    rule = lookup(rule_index, sky, rain, wind, location)
 
     # If no exact match is found, return a default classification
-    if matching_rules.empty:
+    if rule is None:
         return "Unknown", "No specific recommendation available."
 
-    # Check for location-specific exceptions
-    for _, rule in matching_rules.iterrows():
-        if rule["Location Exception"] == location:
-            return rule["Classification"], rule["Recommendation"]
-
-    # Return classification and recommendation for the first matching rule
-    first_match = matching_rules.iloc[0]
-    return first_match["Classification"], first_match["Recommendation"]
+    return rule["Classification"], rule["Recommendation"]
 
 
 # === 3️⃣ Free-Text Understanding ===
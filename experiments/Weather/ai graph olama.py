@@ -1,11 +1,24 @@
-import ollama
+import argparse
+import os
+import re
+import sys
+import time
 import pandas as pd
 from langgraph.graph import StateGraph
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+from structured_output import (FusedWeatherAnalysis, PackedWeatherAnalysis, generate_structured,
+                               schema_instructions)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.node_metrics import NodeMetrics
+from common.ollama_client import OllamaClient
 
 # ✅ AI Model Setup
 OLLAMA_MODEL = "llama3.2"
+rules_df = pd.read_excel("rules_multi_factor.xlsx")  # Load rule set once, not per observation
+metrics = NodeMetrics("weather_ollama_graph")
+ollama_client = OllamaClient(OLLAMA_MODEL)  # keep_alive keeps the model loaded across the whole run
 
 
 # ✅ Define the State Model
@@ -32,7 +45,7 @@ def extract_weather_info(state: WeatherState) -> WeatherState:
         return state  # No change if no observation
 
     prompt = f"Extract key weather conditions from this text: '{state.free_text_observation}'. List only the keywords."
-    response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+    response = ollama_client.chat([{"role": "user", "content": prompt}])
 
     state.extracted_weather = response['message']['content'].split(", ")
     return state
@@ -45,7 +58,7 @@ def extract_items(state: WeatherState) -> WeatherState:
         return state  # No change if no observation
 
     prompt = f"Extract items (e.g., umbrella, coat, boots) from this text: '{state.free_text_observation}'."
-    response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+    response = ollama_client.chat([{"role": "user", "content": prompt}])
 
     state.extracted_items = response['message']['content'].split(", ")
     return state
@@ -54,8 +67,6 @@ def extract_items(state: WeatherState) -> WeatherState:
 # ✅ Rule Matching Agent
 def match_rules(state: WeatherState) -> WeatherState:
     """Matches observations to predefined weather rules."""
-    rules_df = pd.read_excel("rules_multi_factor.xlsx")  # Load rule set
-
     for _, row in rules_df.iterrows():
         if (
                 row["Sky Condition"] == state.sky_condition
@@ -81,7 +92,7 @@ def generate_ai_recommendation(state: WeatherState) -> WeatherState:
     sky: '{state.sky_condition}', rain: '{state.rain_condition}', wind: '{state.wind_condition}', 
     and extracted weather: '{state.extracted_weather}', provide a detailed recommendation including precautions and activity suggestions."""
 
-    response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+    response = ollama_client.chat([{"role": "user", "content": prompt}])
 
     state.ai_powered_recommendations = response['message']['content']
     return state
@@ -93,7 +104,7 @@ def generate_ai_explanation(state: WeatherState) -> WeatherState:
     prompt = f"""Explain why the recommendation '{state.recommendation}' was given for classification '{state.final_classification}', 
     and how it relates to the extracted weather: '{state.extracted_weather}'."""
 
-    response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+    response = ollama_client.chat([{"role": "user", "content": prompt}])
 
     state.ai_explanation = response['message']['content']
     return state
@@ -104,7 +115,7 @@ def detect_contradictions(state: WeatherState) -> WeatherState:
     """Detects logical contradictions in observations (e.g., 'It's sunny but I have an umbrella')."""
     if state.free_text_observation:
         prompt = f"Check if there are contradictions in this weather report: '{state.free_text_observation}'. Provide 'None' if there are no contradictions."
-        response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+        response = ollama_client.chat([{"role": "user", "content": prompt}])
 
         state.contradiction_warning = response['message']['content']
     return state
@@ -116,16 +127,71 @@ def generate_report(state: WeatherState) -> Dict:
     return dict(state)
 
 
+# ✅ Fused Agent: every LLM field in one structured request
+def fused_prompt(state: WeatherState) -> str:
+    return f"""Analyze this weather observation.
+    Location: '{state.location}'
+    Sky: '{state.sky_condition}', rain: '{state.rain_condition}', wind: '{state.wind_condition}'
+    Observation: '{state.free_text_observation}'
+    Rule classification: '{state.final_classification}', rule recommendation: '{state.recommendation}'
+
+    Extract the weather keywords and the items (e.g., umbrella, coat, boots) from the observation,
+    give a detailed recommendation including precautions and activity suggestions, explain why the rule
+    recommendation was given, and report contradictions in the observation ('None' if there are none)."""
+
+
+def chat_structured(conversations, schema):
+    """Schema-constrained ollama calls, made in the calling node so metrics attribute tokens to it."""
+    replies = []
+    for messages in conversations:
+        response = ollama_client.chat(messages, format=schema.model_json_schema(), options={"temperature": 0})
+        replies.append(response['message']['content'])
+    return replies
+
+
+def apply_fused(state: WeatherState, analysis) -> WeatherState:
+    if analysis is not None:
+        state.extracted_weather = analysis.extracted_weather
+        state.extracted_items = analysis.extracted_items
+        state.ai_powered_recommendations = analysis.ai_powered_recommendations
+        state.ai_explanation = analysis.ai_explanation
+        state.contradiction_warning = analysis.contradiction_warning
+    return state
+
+
+def fused_analysis(state: WeatherState) -> WeatherState:
+    """One validated request replaces the five sequential generations of the multi-call graph."""
+    prompt = f"{fused_prompt(state)}\n\n{schema_instructions(FusedWeatherAnalysis)}"
+    (analysis,), _ = generate_structured([[{"role": "user", "content": prompt}]],
+                                         lambda batch: chat_structured(batch, FusedWeatherAnalysis),
+                                         schema=FusedWeatherAnalysis)
+    return apply_fused(state, analysis)
+
+
+def fused_analysis_packed(states: List[WeatherState]) -> List[WeatherState]:
+    """Several observations per request; observations missing from the reply fall back to one request each."""
+    numbered = "\n\n".join(f"Observation {n}:\n{fused_prompt(state)}" for n, state in enumerate(states, 1))
+    prompt = (f"Analyze each numbered observation separately and return one result per observation, "
+              f"with its number in 'observation'.\n\n{numbered}\n\n{schema_instructions(PackedWeatherAnalysis)}")
+    (packed,), _ = generate_structured([[{"role": "user", "content": prompt}]],
+                                       lambda batch: chat_structured(batch, PackedWeatherAnalysis),
+                                       schema=PackedWeatherAnalysis)
+    by_number = {result.observation: result for result in packed.results} if packed else {}
+    return [apply_fused(state, by_number[n]) if n in by_number else fused_analysis(state)
+            for n, state in enumerate(states, 1)]
+
+
 # ✅ LangGraph Workflow Definition
 workflow = StateGraph(WeatherState)
 
 # ✅ Define the Nodes
-workflow.add_node("extract_weather_info", extract_weather_info)
-workflow.add_node("extract_items", extract_items)
-workflow.add_node("match_rules", match_rules)
-workflow.add_node("generate_ai_recommendation", generate_ai_recommendation)
-workflow.add_node("generate_ai_explanation", generate_ai_explanation)
-workflow.add_node("detect_contradictions", detect_contradictions)
+workflow.add_node("extract_weather_info", metrics.instrument("extract_weather_info", extract_weather_info))
+workflow.add_node("extract_items", metrics.instrument("extract_items", extract_items))
+workflow.add_node("match_rules", metrics.instrument("match_rules", match_rules))
+workflow.add_node("generate_ai_recommendation",
+                  metrics.instrument("generate_ai_recommendation", generate_ai_recommendation))
+workflow.add_node("generate_ai_explanation", metrics.instrument("generate_ai_explanation", generate_ai_explanation))
+workflow.add_node("detect_contradictions", metrics.instrument("detect_contradictions", detect_contradictions))
 workflow.add_node("generate_report", generate_report)
 
 # ✅ Define the Workflow Edges
@@ -143,26 +209,117 @@ workflow.set_finish_point("generate_report")
 # ✅ Compile the Workflow
 executor = workflow.compile()
 
-# ✅ Load Observations and Run Pipeline
-observations_df = pd.read_excel("observations_free_text.xlsx")  # Load test observations
-processed_results = []
+# ✅ Fused Workflow: rules first (no LLM), then a single LLM call
+fused_workflow = StateGraph(WeatherState)
+fused_workflow.add_node("match_rules", metrics.instrument("fused_match_rules", match_rules))
+fused_workflow.add_node("fused_analysis", metrics.instrument("fused_analysis", fused_analysis))
+fused_workflow.add_node("generate_report", generate_report)
+fused_workflow.add_edge("match_rules", "fused_analysis")
+fused_workflow.add_edge("fused_analysis", "generate_report")
+fused_workflow.set_entry_point("match_rules")
+fused_workflow.set_finish_point("generate_report")
+fused_executor = fused_workflow.compile()
 
-for _, row in observations_df.iterrows():
-    input_state = WeatherState(
+run_packed = metrics.instrument("fused_analysis_packed", fused_analysis_packed)
+
+
+def input_states(observations_df):
+    return [WeatherState(
         location=row["Location"],
         sky_condition=row["Sky Condition"],
         rain_condition=row["Rain Condition"],
         wind_condition=row["Wind Condition"],
         free_text_observation=row["Free Text Observation"]
-    )
-
-    output = executor.invoke(input_state)
-    processed_results.append(output)
+    ) for row in observations_df.to_dict("records")]
+
+
+def run_pipeline(observations_df, mode="graph", pack_size=1):
+    """Processed results as dicts: the multi-call graph, the fused graph, or fused requests packed pack_size rows each."""
+    states = input_states(observations_df)
+    if mode == "graph":
+        return [dict(executor.invoke(state)) for state in states]
+    if pack_size <= 1:
+        return [dict(fused_executor.invoke(state)) for state in states]
+    states = [match_rules(state) for state in states]
+    results = []
+    for start in range(0, len(states), pack_size):
+        results.extend(dict(state) for state in run_packed(states[start:start + pack_size]))
+    return results
+
+
+def _words(value):
+    text = " ".join(value) if isinstance(value, list) else str(value or "")
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def _jaccard(a, b):
+    a, b = _words(a), _words(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _no_contradiction(text):
+    return str(text or "None").strip().lower().startswith(("none", "no contradiction"))
+
+
+def compare_modes(observations_df, pack_size=1):
+    """Latency, tokens and agreement of the fused mode against the multi-call graph."""
+    summary = {}
+    outputs = {}
+    for mode in ("graph", "fused"):
+        before = metrics.snapshot()["nodes"]
+        start = time.perf_counter()
+        outputs[mode] = run_pipeline(observations_df, mode, pack_size)
+        elapsed = time.perf_counter() - start
+        after = metrics.snapshot()["nodes"]
+        tokens = sum(node["prompt_tokens"] + node["completion_tokens"] for node in after.values()) - \
+            sum(node["prompt_tokens"] + node["completion_tokens"] for node in before.values())
+        calls = sum(node["llm_calls"] for node in after.values()) - sum(node["llm_calls"] for node in before.values())
+        summary[mode] = {"seconds": elapsed, "ms_per_row": elapsed / len(observations_df) * 1000,
+                         "llm_calls": calls, "tokens": tokens}
+
+    pairs = list(zip(outputs["graph"], outputs["fused"]))
+    agreement = {
+        "extracted_weather (jaccard)": sum(_jaccard(a["extracted_weather"], b["extracted_weather"]) for a, b in pairs),
+        "extracted_items (jaccard)": sum(_jaccard(a["extracted_items"], b["extracted_items"]) for a, b in pairs),
+        "recommendation words (jaccard)": sum(_jaccard(a["ai_powered_recommendations"],
+                                                       b["ai_powered_recommendations"]) for a, b in pairs),
+        "contradiction flag (match)": sum(_no_contradiction(a["contradiction_warning"]) ==
+                                          _no_contradiction(b["contradiction_warning"]) for a, b in pairs),
+    }
+
+    print(f"\n📊 Multi-call graph vs fused (pack size {pack_size}) on {len(observations_df)} observations")
+    print(f"{'mode':<8} {'seconds':>9} {'ms/row':>9} {'llm calls':>10} {'tokens':>9}")
+    for mode, row in summary.items():
+        print(f"{mode:<8} {row['seconds']:>9.1f} {row['ms_per_row']:>9.0f} {row['llm_calls']:>10} {row['tokens']:>9}")
+    for name, total in agreement.items():
+        print(f"{name:<34} {total / len(pairs):.2f}")
+    return summary, agreement
 
-# ✅ Convert Processed Results to DataFrame
-df_report = pd.DataFrame([dict(result) for result in processed_results])  # 🔥 FIXED!
 
-# ✅ Save Report to Excel
-df_report.to_excel("AI_Weather_Report.xlsx", index=False)
-
-print("🚀 AI Weather Report Generated Successfully! Check 'AI_Weather_Report.xlsx' 🎉")
\ No newline at end of file
+# ✅ Load Observations and Run Pipeline
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama LangGraph weather report")
+    parser.add_argument('--mode', choices=["graph", "fused", "compare"], default="graph",
+                        help='graph: one LLM call per field; fused: one structured call per observation')
+    parser.add_argument('--pack-size', type=int, default=1, help='Observations per fused request')
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N observations')
+    args = parser.parse_args()
+
+    observations_df = pd.read_excel("observations_free_text.xlsx")  # Load test observations
+    if args.limit:
+        observations_df = observations_df.head(args.limit)
+
+    if args.mode == "compare":
+        compare_modes(observations_df, args.pack_size)
+    else:
+        processed_results = run_pipeline(observations_df, args.mode, args.pack_size)
+
+        # ✅ Convert Processed Results to DataFrame
+        df_report = pd.DataFrame(processed_results)
+
+        # ✅ Save Report to Excel
+        df_report.to_excel("AI_Weather_Report.xlsx", index=False)
+
+        print("🚀 AI Weather Report Generated Successfully! Check 'AI_Weather_Report.xlsx' 🎉")
+    print(metrics.report())
+    print(ollama_client.report())
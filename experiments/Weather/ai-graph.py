@@ -1,14 +1,37 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import spacy
 from langgraph.graph import StateGraph
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
-# Load NLP model
-nlp = spacy.load("en_core_web_sm")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.node_metrics import NodeMetrics
+from rule_index import build_rule_index, lookup, match_frame
+from entity_extraction import load_pos_pipeline, extract_pos_terms
+
+# Per-node latency/CPU histograms for this pipeline
+metrics = NodeMetrics("weather_langgraph")
+
+# Load NLP model (tagger only: parser and NER are not needed for POS filtering)
+nlp = load_pos_pipeline()
 
 # Load data
 df_rules = pd.read_excel("rules_multi_factor.xlsx")
 df_observations = pd.read_excel("observations_free_text.xlsx")
+rule_index = build_rule_index(df_rules)  # (sky, rain, wind, location) -> rule, with wildcard-location fallback
+
+# Row mode fills this with one batched nlp.pipe pass before invoking the graph; extract_items reads from here
+observation_nouns = {}
+
+WEATHER_GEAR = {
+    "Rain": ["umbrella", "raincoat", "boots"],
+    "Snow": ["boots", "coat", "gloves"],
+    "Windy": ["windbreaker", "scarf"],
+    "Hot": ["hat", "sunglasses"],
+    "Cold": ["jacket", "gloves"],
+}
 
 # ✅ Define a Pydantic State Model
 class WeatherState(BaseModel):
@@ -26,23 +49,19 @@ class WeatherState(BaseModel):
 # 1️⃣ **Rule Matching**
 def rule_matching(state: WeatherState) -> WeatherState:
     """Matches observations with predefined rules."""
-    matching_rules = df_rules[
-        (df_rules["Sky Condition"] == state.sky_condition) &
-        (df_rules["Rain Condition"] == state.rain_condition) &
-        (df_rules["Wind Condition"] == state.wind_condition)
-    ]
-    if not matching_rules.empty:
-        for _, rule in matching_rules.iterrows():
-            if rule["Location Exception"] == state.location:
-                state.classification = rule["Classification"]
-                state.rule_recommendation = rule["Recommendation"]
+    rule = lookup(rule_index, state.sky_condition, state.rain_condition, state.wind_condition, state.location)
+    if rule is not None:
+        state.classification = rule["Classification"]
+        state.rule_recommendation = rule["Recommendation"]
     return state
 
 # 2️⃣ **Extract Items from Free Text**
 def extract_items(state: WeatherState) -> WeatherState:
     """Extracts relevant items (e.g., umbrella, coat) from free text."""
-    doc = nlp(state.free_text_observation)
-    state.extracted_items = ", ".join({token.text.lower() for token in doc if token.pos_ in ["NOUN", "PROPN"]})
+    nouns = observation_nouns.get(state.free_text_observation)
+    if nouns is None:
+        nouns = extract_pos_terms([state.free_text_observation], nlp)[0]
+    state.extracted_items = ", ".join(nouns)
     return state
 
 # 3️⃣ **Contradiction Detection**
@@ -55,39 +74,37 @@ def detect_contradictions(state: WeatherState) -> WeatherState:
 # 4️⃣ **AI-Based Recommendations**
 def generate_recommendation(state: WeatherState) -> WeatherState:
     """Generates AI-powered recommendations based on free text and rules."""
-    extracted_items = state.extracted_items.split(", ")
-    weather_gear = {
-        "Rain": ["umbrella", "raincoat", "boots"],
-        "Snow": ["boots", "coat", "gloves"],
-        "Windy": ["windbreaker", "scarf"],
-        "Hot": ["hat", "sunglasses"],
-        "Cold": ["jacket", "gloves"],
-    }
+    state.ai_recommendation = recommend(state.location, state.free_text_observation, state.extracted_items,
+                                        state.rule_recommendation)
+    return state
+
 
+def recommend(location, free_text_observation, extracted_items, rule_recommendation):
+    """Rule recommendation plus gear the free text implies but does not mention (shared by row and batch mode)."""
+    extracted_items = extracted_items.split(", ")
     missing_items = set()
-    free_text = state.free_text_observation.lower()
+    free_text = free_text_observation.lower()
 
-    for condition, gear in weather_gear.items():
+    for condition, gear in WEATHER_GEAR.items():
         if condition.lower() in free_text and not any(item in extracted_items for item in gear):
             missing_items.update(gear)
 
-    if state.location == "Denver" and "snow" in free_text:
+    if location == "Denver" and "snow" in free_text:
         missing_items.discard("boots")
 
-    state.ai_recommendation = f"{state.rule_recommendation}."
+    ai_recommendation = f"{rule_recommendation}."
     if missing_items:
-        state.ai_recommendation += f" Consider using: {', '.join(missing_items)}."
-
-    return state
+        ai_recommendation += f" Consider using: {', '.join(missing_items)}."
+    return ai_recommendation
 
 # 🏗 **Building the LangGraph Workflow**
 workflow = StateGraph(state_schema=WeatherState)  # ✅ Now defining state_schema
 
 # Define nodes
-workflow.add_node("rule_matching", rule_matching)
-workflow.add_node("extract_items", extract_items)
-workflow.add_node("detect_contradictions", detect_contradictions)
-workflow.add_node("generate_recommendation", generate_recommendation)
+workflow.add_node("rule_matching", metrics.instrument("rule_matching", rule_matching))
+workflow.add_node("extract_items", metrics.instrument("extract_items", extract_items))
+workflow.add_node("detect_contradictions", metrics.instrument("detect_contradictions", detect_contradictions))
+workflow.add_node("generate_recommendation", metrics.instrument("generate_recommendation", generate_recommendation))
 
 # Define execution order
 workflow.add_edge("rule_matching", "extract_items")
@@ -103,32 +120,136 @@ workflow.set_entry_point("rule_matching")
 # Compile AI Graph
 ai_weather_chain = workflow.compile()
 
+
+# 📦 **Batch Mode: the same steps over a columnar chunk of observations**
+class WeatherBatchState(BaseModel):
+    """One chunk of observations; every node reads and adds whole columns."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    frame: pd.DataFrame
+
+
+def rule_matching_batch(state: WeatherBatchState) -> WeatherBatchState:
+    """Matches the whole chunk against the rules with two hash joins."""
+    matched = match_frame(state.frame, df_rules, default_recommendation="No recommendation")
+    state.frame["classification"] = matched["Final Classification"]
+    state.frame["rule_recommendation"] = matched["Recommendation"]
+    return state
+
+
+def extract_items_batch(state: WeatherBatchState) -> WeatherBatchState:
+    """POS-tags the chunk's free text in one nlp.pipe pass."""
+    nouns = extract_pos_terms(state.frame["Free Text Observation"], nlp)
+    state.frame["extracted_items"] = [", ".join(terms) for terms in nouns]
+    return state
+
+
+def detect_contradictions_batch(state: WeatherBatchState) -> WeatherBatchState:
+    """Flags sunny skies with rain in the free text, column-wise."""
+    frame = state.frame
+    contradiction = (frame["Sky Condition"].str.lower().str.contains("sunny", na=False)
+                     & frame["Free Text Observation"].str.lower().str.contains("rain", na=False))
+    frame["contradiction_warning"] = "None"
+    frame.loc[contradiction, "contradiction_warning"] = "⚠️ Contradiction: Sunny but mentions rain in free text."
+    return state
+
+
+def generate_recommendation_batch(state: WeatherBatchState) -> WeatherBatchState:
+    """Builds the recommendation column without per-row graph dispatch."""
+    frame = state.frame
+    frame["ai_recommendation"] = [
+        recommend(location, free_text, items, rule_recommendation)
+        for location, free_text, items, rule_recommendation in zip(
+            frame["Location"], frame["Free Text Observation"], frame["extracted_items"], frame["rule_recommendation"])
+    ]
+    return state
+
+
+batch_workflow = StateGraph(state_schema=WeatherBatchState)
+batch_workflow.add_node("rule_matching", metrics.instrument("rule_matching_batch", rule_matching_batch))
+batch_workflow.add_node("extract_items", metrics.instrument("extract_items_batch", extract_items_batch))
+batch_workflow.add_node("detect_contradictions",
+                        metrics.instrument("detect_contradictions_batch", detect_contradictions_batch))
+batch_workflow.add_node("generate_recommendation",
+                        metrics.instrument("generate_recommendation_batch", generate_recommendation_batch))
+batch_workflow.add_edge("rule_matching", "extract_items")
+batch_workflow.add_edge("extract_items", "detect_contradictions")
+batch_workflow.add_edge("detect_contradictions", "generate_recommendation")
+batch_workflow.set_entry_point("rule_matching")
+batch_workflow.set_finish_point("generate_recommendation")
+ai_weather_batch_chain = batch_workflow.compile()
+
+REPORT_COLUMNS = {
+    "Location": "Location", "Sky Condition": "Sky Condition", "Rain Condition": "Rain Condition",
+    "Wind Condition": "Wind Condition", "Free Text Observation": "Free-Text Observation",
+    "classification": "Final Classification", "extracted_items": "Extracted Items",
+    "ai_recommendation": "AI-Powered Recommendations", "contradiction_warning": "Contradiction Warnings",
+}
+
+
+def run_batch_chunk(frame):
+    """Invokes the batch graph once for a chunk and returns the report columns."""
+    output = ai_weather_batch_chain.invoke(WeatherBatchState(frame=frame.copy()))
+    return output["frame"][list(REPORT_COLUMNS)].rename(columns=REPORT_COLUMNS)
+
+
+def run_batch(df, chunk_size=50_000, workers=1):
+    """Whole-frame mode: the graph runs once per chunk, chunks are spread over a process pool."""
+    chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch_chunk, chunks))
+    else:
+        results = [run_batch_chunk(chunk) for chunk in chunks]
+    return pd.concat(results, ignore_index=True)
+
+
+def run_rows(df):
+    """Row-at-a-time mode: one graph invocation per observation (kept for interactive use)."""
+    observation_nouns.update(zip(df["Free Text Observation"], extract_pos_terms(df["Free Text Observation"], nlp)))
+
+    final_results = []
+    for _, row in df.iterrows():
+        state = WeatherState(
+            location=row["Location"],
+            sky_condition=row["Sky Condition"],
+            rain_condition=row["Rain Condition"],
+            wind_condition=row["Wind Condition"],
+            free_text_observation=row["Free Text Observation"]
+        )  # ✅ Using Pydantic model for state
+
+        output = ai_weather_chain.invoke(state)  # Run AI pipeline
+
+        # ✅ **Fix: Use dictionary-style access for AddableValuesDict**
+        final_results.append([
+            output["location"], output["sky_condition"], output["rain_condition"], output["wind_condition"],
+            output["free_text_observation"], output["classification"], output["extracted_items"],
+            output["ai_recommendation"], output["contradiction_warning"]
+        ])
+
+    # Convert results to DataFrame
+    return pd.DataFrame(final_results, columns=list(REPORT_COLUMNS.values()))
+
+
 # 🚀 **Run AI Chain on Observations**
-final_results = []
-for _, row in df_observations.iterrows():
-    state = WeatherState(
-        location=row["Location"],
-        sky_condition=row["Sky Condition"],
-        rain_condition=row["Rain Condition"],
-        wind_condition=row["Wind Condition"],
-        free_text_observation=row["Free Text Observation"]
-    )  # ✅ Using Pydantic model for state
-
-    output = ai_weather_chain.invoke(state)  # Run AI pipeline
-
-    # ✅ **Fix: Use dictionary-style access for AddableValuesDict**
-    final_results.append([
-        output["location"], output["sky_condition"], output["rain_condition"], output["wind_condition"],
-        output["free_text_observation"], output["classification"], output["extracted_items"],
-        output["ai_recommendation"], output["contradiction_warning"]
-    ])
-
-# Convert results to DataFrame
-df_report = pd.DataFrame(final_results, columns=[
-    "Location", "Sky Condition", "Rain Condition", "Wind Condition", "Free-Text Observation",
-    "Final Classification", "Extracted Items", "AI-Powered Recommendations", "Contradiction Warnings"
-])
-
-# Save Report
-df_report.to_excel("semantic_rule_report_langgraph_fixed.xlsx", index=False)
-print("✅ AI-powered weather report saved as: semantic_rule_report_langgraph_fixed.xlsx")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weather LangGraph pipeline")
+    parser.add_argument('--mode', choices=["row", "batch"], default="row",
+                        help='row: one graph call per observation; batch: one call per chunk')
+    parser.add_argument('--chunk-size', type=int, default=50_000, help='Observations per chunk in batch mode')
+    parser.add_argument('--workers', type=int, default=1, help='Processes for batch chunks')
+    args = parser.parse_args()
+
+    if args.mode == "batch":
+        df_report = run_batch(df_observations, args.chunk_size, args.workers)
+    else:
+        df_report = run_rows(df_observations)
+
+    # Save Report
+    df_report.to_excel("semantic_rule_report_langgraph_fixed.xlsx", index=False)
+    print("✅ AI-powered weather report saved as: semantic_rule_report_langgraph_fixed.xlsx")
+
+    # Export node timings to find the node worth optimizing (batch workers keep their own, unexported, metrics)
+    metrics.export("langgraph_metrics_weather")
+    print(metrics.report())
+    print("📊 Node metrics saved as: langgraph_metrics_weather.json / .prom")
@@ -0,0 +1,70 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from rule_index import RULE_KEYS, build_rule_index, lookup, match_frame
+
+
+def legacy_rule_matching(df_rules, sky, rain, wind, location):
+    """The per-observation path used by the original scripts: three boolean masks, then iterrows."""
+    matching_rules = df_rules[
+        (df_rules["Sky Condition"] == sky) &
+        (df_rules["Rain Condition"] == rain) &
+        (df_rules["Wind Condition"] == wind)
+    ]
+    classification, recommendation = "Unknown", "No recommendation"
+    for _, rule in matching_rules.iterrows():
+        if rule["Location Exception"] == location:
+            classification, recommendation = rule["Classification"], rule["Recommendation"]
+    return classification, recommendation
+
+
+def synthetic_observations(df_rules, size, rng):
+    """Draws observations from the condition values that appear in the rules, plus known locations."""
+    locations = pd.concat([df_rules["Location Exception"].dropna(),
+                           pd.Series(["Seattle", "Denver", "Miami", "Chicago", "Phoenix"])]).unique()
+    data = {key: rng.choice(df_rules[key].dropna().unique(), size=size) for key in RULE_KEYS}
+    data["Location"] = rng.choice(locations, size=size)
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rule matching: masks + iterrows vs hash index vs join")
+    parser.add_argument('--rules', type=str, default="rules_multi_factor.xlsx", help='Rules Excel file')
+    parser.add_argument('--size', type=int, default=1_000_000, help='Number of synthetic observations')
+    parser.add_argument('--legacy-sample', type=int, default=5_000,
+                        help='Observations timed on the legacy path (extrapolated to --size)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    df_rules = pd.read_excel(args.rules)
+    df_observations = synthetic_observations(df_rules, args.size, rng)
+    rows = list(df_observations[RULE_KEYS + ["Location"]].itertuples(index=False, name=None))
+
+    sample = rows[:args.legacy_sample]
+    start = time.perf_counter()
+    for sky, rain, wind, location in sample:
+        legacy_rule_matching(df_rules, sky, rain, wind, location)
+    legacy = (time.perf_counter() - start) / len(sample) * args.size
+
+    start = time.perf_counter()
+    rule_index = build_rule_index(df_rules)
+    for sky, rain, wind, location in rows:
+        lookup(rule_index, sky, rain, wind, location)
+    hashed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    match_frame(df_observations, df_rules)
+    joined = time.perf_counter() - start
+
+    print(f"\n📊 Rule matching on {args.size:,} observations ({len(df_rules)} rules)")
+    print(f"{'masks + iterrows (extrapolated)':<34} {legacy:>10.2f} s")
+    print(f"{'hash index, per row':<34} {hashed:>10.2f} s  ({legacy / hashed:,.0f}x)")
+    print(f"{'hash join, whole frame':<34} {joined:>10.2f} s  ({legacy / joined:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.lazy_import import lazy_import
+
+# spaCy is imported the first time a pipeline is built, not when this module is imported
+spacy = lazy_import("spacy")
+spacy_matcher = lazy_import("spacy.matcher")
+
+# Components en_core_web_sm does not need for part-of-speech tags
+POS_ONLY_DISABLED = ["parser", "ner", "lemmatizer"]
+
+
+def load_pos_pipeline(model="en_core_web_sm"):
+    """Loads the spaCy model with only the components POS tagging needs."""
+    return spacy.load(model, disable=POS_ONLY_DISABLED)
+
+
+def extract_pos_terms(texts, nlp, pos=("NOUN", "PROPN"), vocabulary=None, batch_size=256, n_process=1):
+    """Returns, per text, the lower-cased tokens with the given POS tags (optionally restricted to vocabulary).
+
+    Texts are streamed through nlp.pipe in batches; n_process > 1 spreads them over worker processes.
+    """
+    pos = set(pos)
+    results = []
+    for doc in nlp.pipe((str(text) for text in texts), batch_size=batch_size, n_process=n_process):
+        terms = dict.fromkeys(token.text.lower() for token in doc if token.pos_ in pos)
+        if vocabulary is not None:
+            terms = dict.fromkeys(term for term in terms if term in vocabulary)
+        results.append(list(terms))
+    return results
+
+
+class KeywordExtractor:
+    """Tokenizer-only keyword lookup with a PhraseMatcher: no tagger, parser or NER runs at all."""
+
+    def __init__(self, terms_by_label, language="en"):
+        self.nlp = spacy.blank(language)
+        self.matcher = spacy_matcher.PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        self.labels = list(terms_by_label)
+        for label, terms in terms_by_label.items():
+            self.matcher.add(label, [self.nlp.make_doc(term) for term in sorted(terms)])
+
+    def extract(self, texts, batch_size=1024):
+        """Returns, per text, {label: [matched terms in order of appearance]}."""
+        results = []
+        for doc in self.nlp.pipe((str(text) for text in texts), batch_size=batch_size):
+            found = {label: {} for label in self.labels}
+            for match_id, start, end in self.matcher(doc):
+                found[self.nlp.vocab.strings[match_id]][doc[start:end].text.lower()] = None
+            results.append({label: list(terms) for label, terms in found.items()})
+        return results
+
+
+def docs_per_second(function, texts):
+    start = time.perf_counter()
+    function(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Docs/second of the Weather entity extraction variants")
+    parser.add_argument('--observations', type=str, default="observations_free_text.xlsx")
+    parser.add_argument('--size', type=int, default=20_000, help='Number of texts (observations are repeated)')
+    parser.add_argument('--n-process', type=int, default=2, help='Processes for nlp.pipe')
+    args = parser.parse_args()
+
+    import pandas as pd
+    base = pd.read_excel(args.observations)["Free Text Observation"].astype(str).tolist()
+    texts = (base * (args.size // len(base) + 1))[:args.size]
+    terms = {"WEATHER": {"rain", "snow", "wind", "storm", "sun"}, "ITEM": {"umbrella", "coat", "hat", "boots", "gloves"}}
+
+    full = spacy.load("en_core_web_sm")
+    pos_only = load_pos_pipeline()
+    keywords = KeywordExtractor(terms)
+
+    results = {
+        "nlp(text) per doc, full pipeline": docs_per_second(lambda ts: [full(t) for t in ts], texts),
+        "nlp.pipe, POS only": docs_per_second(lambda ts: extract_pos_terms(ts, pos_only), texts),
+        f"nlp.pipe, POS only, n_process={args.n_process}":
+            docs_per_second(lambda ts: extract_pos_terms(ts, pos_only, n_process=args.n_process), texts),
+        "PhraseMatcher, tokenizer only": docs_per_second(keywords.extract, texts),
+    }
+
+    baseline = results["nlp(text) per doc, full pipeline"]
+    print(f"\n📊 Entity extraction on {len(texts):,} texts")
+    for name, rate in results.items():
+        print(f"{name:<40} {rate:>10,.0f} docs/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
 import pandas as pd
-import requests
 import torch
 import numpy as np
 import os
+import sys
 import time
 import spacy
 import random
 from collections import defaultdict, deque
 from sentence_transformers import SentenceTransformer, util
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_backend import LLMClient, OllamaBackend
+
 # Define the Ollama model to use
 OLLAMA_MODEL = "llama3.2"  # Change this to your preferred local model (e.g., "llama3.2")
+# Concurrent requests; start the server with OLLAMA_NUM_PARALLEL set to at least this
+llm_client = LLMClient(OllamaBackend(OLLAMA_MODEL), max_workers=int(os.getenv("LLM_MAX_WORKERS", "4")),
+                       cache_file="ai_explanations_cache.db")
 
 # Load pre-trained AI models
 nlp = spacy.load("en_core_web_sm")  # NER for extracting weather conditions & items
@@ -105,11 +111,8 @@ df_report = pd.DataFrame(report)
 
 # === Ollama-Based AI Explanation Generation ===
 def generate_ai_explanations_ollama(df):
-    """Uses Ollama to generate AI explanations for weather observations."""
-    explanations = []
-
-    for _, row in df.iterrows():
-        prompt = f"""
+    """Uses Ollama to generate AI explanations for weather observations, several requests in flight at once."""
+    prompts = [f"""
         The AI analyzed weather conditions, observations, and past usage patterns.
         Location: {row["Location"]}
         Weather: {row["Sky Condition"]}, {row["Rain Condition"]}, {row["Wind Condition"]}
@@ -117,20 +120,8 @@ def generate_ai_explanations_ollama(df):
         Recommendation: {row["AI-Powered Recommendations"]}
 
         Explain why this recommendation is useful in simple terms.
-        """
-
-        try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
-            )
-            response_data = response.json()
-            explanations.append(response_data.get("response", "❌ Ollama error"))
-
-        except Exception as e:
-            explanations.append(f"❌ Ollama request failed: {str(e)}")
-
-    return explanations
+        """ for row in df.to_dict("records")]
+    return llm_client.complete_many(prompts, on_error=lambda e: f"❌ Ollama request failed: {str(e)}")
 
 
 # Apply AI explanation generation using LLaMA via Ollama
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+NO_RECOMMENDATION = "✅ No additional recommendations."
+
+
+def parse_items(items):
+    """Splits an "Extracted Items" value into a list; "None" or missing gives []."""
+    if not isinstance(items, str) or items == "None":
+        return []
+    return [item for item in items.split(", ") if item]
+
+
+def item_bitsets(item_lists, vocabulary):
+    """(rows, words) uint64 bitsets: bit j % 64 of word j // 64 is set when vocabulary[j] is present."""
+    words = max(1, -(-len(vocabulary) // 64))
+    bits = np.zeros((len(item_lists), words), dtype=np.uint64)
+    exploded = pd.Series(item_lists, dtype=object).explode().dropna()
+    if len(exploded):
+        codes = pd.Categorical(exploded, categories=vocabulary).codes.astype(np.int64)
+        np.bitwise_or.at(bits, (exploded.index.to_numpy(), codes // 64),
+                         np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64)))
+    return bits
+
+
+def decode(bitset, vocabulary):
+    return [item for j, item in enumerate(vocabulary) if int(bitset[j // 64]) >> (j % 64) & 1]
+
+
+def recommend_from_history(locations, extracted_items):
+    """Suggests, per observation, the items seen at other locations but missing from it.
+
+    Pass one ORs every observation's item bitset into its location's bitset (a groupby).
+    Pass two computes location_bits & ~row_bits for every other location, once per distinct
+    (location, items) combination. The result only depends on the data, not on row order.
+    Observations without a location neither contribute history nor get recommendations.
+    """
+    item_lists = [parse_items(items) for items in extracted_items]
+    vocabulary = sorted({item for items in item_lists for item in items})
+    bits = item_bitsets(item_lists, vocabulary)
+
+    location_codes, location_names = pd.factorize(pd.Series(list(locations)), sort=True)
+    # factorize gives missing locations code -1, which would index the last location
+    known = location_codes >= 0
+    location_codes, bits = location_codes[known], bits[known]
+    location_bits = np.zeros((len(location_names), bits.shape[1]), dtype=np.uint64)
+    np.bitwise_or.at(location_bits, location_codes, bits)
+
+    keys = np.column_stack([location_codes.astype(np.uint64), bits])
+    combinations, inverse = np.unique(keys, axis=0, return_inverse=True)
+    missing = location_bits[None, :, :] & ~combinations[:, None, 1:]
+    has_missing = missing.any(axis=2)
+
+    messages = []
+    for combination, (key, row_missing) in enumerate(zip(combinations, missing)):
+        location = location_names[int(key[0])]
+        recommendations = [
+            f"Consider using {', '.join(decode(row_missing[past], vocabulary))} in {location}, "
+            f"based on past observations in {past_location}."
+            for past, past_location in enumerate(location_names)
+            if past != int(key[0]) and has_missing[combination, past]
+        ]
+        messages.append(" ".join(recommendations) if recommendations else NO_RECOMMENDATION)
+
+    results = np.full(len(known), NO_RECOMMENDATION, dtype=object)
+    results[known] = [messages[i] for i in inverse.reshape(-1)]
+    return results.tolist()
@@ -1,22 +1,24 @@
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
 import pandas as pd
-import matplotlib.pyplot as plt
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from trend_store import TrendStore
 
-# Load the AI-generated weather report
-df_report = pd.read_excel("final_ai_weather_report_ollama.xlsx")
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+ReportRow = namedtuple("ReportRow", "location sky rain wind observation recommendation classification")
 
 
 # === 📊 Generate Weather Trends ===
-def generate_weather_trends(df):
-    """Creates trend analysis visualizations for weather conditions."""
-
-    # Convert categorical weather conditions into numerical counts per location
-    trend_data = df.groupby("Location")[["Sky Condition", "Rain Condition", "Wind Condition"]].agg(
-        lambda x: x.mode()[0])
-
-    # Count occurrences of each condition type
-    condition_counts = df.groupby(["Location", "Sky Condition"]).size().unstack(fill_value=0)
+def plot_weather_trends(condition_counts, chart_file):
+    """Draws the chart with the non-interactive Agg backend; runs in a child process."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-    # Plot bar chart
     fig, ax = plt.subplots(figsize=(12, 6))
     condition_counts.plot(kind="bar", stacked=True, ax=ax, colormap="viridis")
 
@@ -28,80 +30,93 @@ def generate_weather_trends(df):
     plt.grid(axis="y", linestyle="--", alpha=0.7)
 
     # Save chart as image
-    plt.savefig("weather_trends.png")
-    plt.show()
+    fig.savefig(chart_file, bbox_inches="tight")
+    plt.close(fig)
+    return chart_file
 
-    print("✅ Weather trend chart saved as weather_trends.png")
 
+def generate_weather_trends(trend_store, chart_file="weather_trends.png", pool=None):
+    """Creates trend analysis visualizations for weather conditions.
 
-# === 📄 Generate HTML Report with Charts ===
-def generate_html_report(df):
-    """Generates an enhanced HTML report with trends and visualizations."""
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>AI Weather Report</title>
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css">
-        <style>
-            body { padding: 20px; }
-            .good { color: green; font-weight: bold; }
-            .bad { color: red; font-weight: bold; }
-            .neutral { color: gray; font-weight: bold; }
-            table { width: 100%; border-collapse: collapse; }
-            th, td { padding: 10px; border: 1px solid #ddd; }
-            th { background-color: #f4f4f4; }
-            img { max-width: 100%; }
-        </style>
-    </head>
-    <body>
-        <h1 class="text-center">🌤 AI Weather Analysis Report</h1>
-        <h2 class="text-center">📊 Weather Trends</h2>
-        <img src="weather_trends.png" alt="Weather Trends" class="img-fluid">
-        <br><br>
-        <h2 class="text-center">📍 Detailed Weather Data</h2>
-        <table class="table table-bordered">
-            <thead>
-                <tr>
-                    <th>📍 Location</th>
-                    <th>🌦 Weather</th>
-                    <th>📝 Observation</th>
-                    <th>📢 AI Suggestion</th>
-                    <th>🏷️ Classification</th>
-                </tr>
-            </thead>
-            <tbody>
+    Counts come from the precomputed trend store, and only they go to the plotting process. With a
+    pool the chart renders while the HTML is written, and a future is returned; without one it renders inline.
     """
+    condition_counts = trend_store.counts("Sky Condition")
+    if pool is None:
+        return plot_weather_trends(condition_counts, chart_file)
+    return pool.submit(plot_weather_trends, condition_counts, chart_file)
 
-    for _, row in df.iterrows():
-        classification = row["Final Classification"]
-        color_class = "good" if classification == "Good" else "bad"
-
-        html_content += f"""
-        <tr>
-            <td>{row['Location']}</td>
-            <td>{row['Sky Condition']}, {row['Rain Condition']}, {row['Wind Condition']}</td>
-            <td>{row['Free-Text Observation']}</td>
-            <td>{row['AI-Powered Recommendations']}</td>
-            <td class="{color_class}">{classification}</td>
-        </tr>
-        """
-
-    html_content += """
-            </tbody>
-        </table>
-    </body>
-    </html>
-    """
 
-    with open("report.html", "w", encoding="utf-8") as f:
-        f.write(html_content)
-
-    print("✅ HTML report with trends generated: report.html")
-
-
-# === RUN REPORT GENERATORS ===
-generate_weather_trends(df_report)
-generate_html_report(df_report)
\ No newline at end of file
+# === 📄 Generate HTML Report with Charts ===
+def report_rows(df):
+    """Yields table rows one at a time so no page is ever built as one big string."""
+    columns = ["Location", "Sky Condition", "Rain Condition", "Wind Condition", "Free-Text Observation",
+               "AI-Powered Recommendations", "Final Classification"]
+    for values in df[columns].itertuples(index=False, name=None):
+        yield ReportRow(*values)
+
+
+def page_file(output_file, page):
+    root, ext = os.path.splitext(output_file)
+    return output_file if page == 1 else f"{root}_page_{page}{ext}"
+
+
+def generate_html_report(df, output_file="report.html", chart_file="weather_trends.png", page_size=5000,
+                         condition_modes=None):
+    """Renders the report template, streaming rows into one HTML file per page of page_size rows."""
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]),
+                      trim_blocks=True, lstrip_blocks=True)
+    template = env.get_template("weather_report.html")
+
+    page_count = max(1, -(-len(df) // page_size))
+    pages = [(page, os.path.basename(page_file(output_file, page))) for page in range(1, page_count + 1)]
+    for page in range(1, page_count + 1):
+        rows = report_rows(df.iloc[(page - 1) * page_size:page * page_size])
+        with open(page_file(output_file, page), "w", encoding="utf-8") as f:
+            template.stream(rows=rows, page=page, page_count=page_count, pages=pages, modes=condition_modes,
+                            chart=os.path.relpath(chart_file, os.path.dirname(os.path.abspath(output_file)))
+                            if chart_file else None).dump(f)
+
+    print(f"✅ HTML report with trends generated: {output_file} ({page_count} page{'s' if page_count > 1 else ''})")
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the AI weather report as HTML (headless)")
+    parser.add_argument('--input', type=str, default="final_ai_weather_report_ollama.xlsx", help='Report workbook')
+    parser.add_argument('--output', type=str, default="report.html", help='First HTML page')
+    parser.add_argument('--chart', type=str, default="weather_trends.png", help='Trend chart image')
+    parser.add_argument('--page-size', type=positive_int, default=5000, help='Table rows per HTML page')
+    parser.add_argument('--no-chart', action='store_true', help='Skip the trend chart')
+    parser.add_argument('--trend-db', type=str, default="weather_trends.db", help='Incremental trend aggregates')
+    args = parser.parse_args()
+
+    # Load the AI-generated weather report
+    df_report = pd.read_excel(args.input)
+
+    # Fold this report's observations into the running aggregates (observations already counted are skipped)
+    trend_store = TrendStore(args.trend_db)
+    changed = trend_store.update(df_report)
+    if changed:
+        print(f"📈 Trend aggregates updated with {changed} observations: {trend_store.total_rows()} so far")
+    condition_modes = trend_store.modes().reset_index().to_dict("records")
+
+    if args.no_chart:
+        generate_html_report(df_report, args.output, None, args.page_size, condition_modes)
+        return
+
+    # === RUN REPORT GENERATORS: chart in a spawned process while the HTML streams ===
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        chart = generate_weather_trends(trend_store, args.chart, pool)
+        generate_html_report(df_report, args.output, args.chart, args.page_size, condition_modes)
+        print(f"✅ Weather trend chart saved as {chart.result()}")
+
+
+if __name__ == "__main__":
+    main()
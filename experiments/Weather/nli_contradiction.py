@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.lazy_import import lazy_import
+
+# torch and transformers are imported when a detector is created, not when this module is imported
+torch = lazy_import("torch")
+transformers = lazy_import("transformers")
+
+DEFAULT_NLI_MODEL = "roberta-large-mnli"
+DISTILLED_NLI_MODEL = "cross-encoder/nli-distilroberta-base"
+
+
+def premise_hypothesis(observation, extracted_weather):
+    """The (premise, hypothesis) pair checked for an observation and its extracted weather terms."""
+    return f"The reported weather conditions are: {extracted_weather}.", f"The observation states: {observation}."
+
+
+def contradiction_message(label, confidence):
+    if label == "CONTRADICTION":
+        return f"⚠️ Contradiction detected ({confidence:.2f}): Observation does not align with extracted weather."
+    elif label == "NEUTRAL":
+        return f"⚠️ Neutral ({confidence:.2f}): Observation might be unclear."
+    return "✅ No contradiction detected."
+
+
+def pair_key(premise, hypothesis):
+    return hashlib.sha1(f"{premise}\x1f{hypothesis}".encode("utf-8")).hexdigest()
+
+
+class ContradictionDetector:
+    """Batched NLI over (premise, hypothesis) pairs.
+
+    Pairs are tokenized once, sorted by length and padded per batch, so short pairs
+    are not padded to the longest one in the data. Results are cached by pair hash;
+    quantize=True applies dynamic int8 quantization to the Linear layers (CPU only).
+    """
+
+    def __init__(self, model_name=DEFAULT_NLI_MODEL, batch_size=32, max_length=256, quantize=False, device=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        model = transformers.AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.device = "cpu"
+        self.model = model.to(self.device)
+        self.labels = [model.config.id2label[i].upper() for i in range(model.config.num_labels)]
+        self.cache = {}
+
+    def predict(self, premises, hypotheses):
+        """Returns [(label, confidence)] per pair, with labels upper-cased (CONTRADICTION/NEUTRAL/ENTAILMENT)."""
+        keys = [pair_key(p, h) for p, h in zip(premises, hypotheses)]
+        pending = {}
+        for key, premise, hypothesis in zip(keys, premises, hypotheses):
+            if key not in self.cache:
+                pending.setdefault(key, (str(premise), str(hypothesis)))
+
+        if pending:
+            pending_keys = list(pending)
+            encoded = self.tokenizer([pending[k][0] for k in pending_keys], [pending[k][1] for k in pending_keys],
+                                     truncation=True, max_length=self.max_length)
+            order = sorted(range(len(pending_keys)), key=lambda i: len(encoded["input_ids"][i]))
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                features = self.tokenizer.pad({name: [values[i] for i in batch] for name, values in encoded.items()},
+                                              return_tensors="pt")
+                with torch.inference_mode():
+                    logits = self.model(**{name: t.to(self.device) for name, t in features.items()}).logits
+                scores, label_ids = logits.softmax(dim=-1).max(dim=-1)
+                for i, label_id, score in zip(batch, label_ids.tolist(), scores.tolist()):
+                    self.cache[pending_keys[i]] = (self.labels[label_id], score)
+
+        return [self.cache[key] for key in keys]
+
+
+def pairs_per_second(function, premises, hypotheses):
+    start = time.perf_counter()
+    results = function(premises, hypotheses)
+    return len(premises) / (time.perf_counter() - start), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and agreement of the Weather NLI contradiction detectors")
+    parser.add_argument('--observations', type=str, default="observations_with_entities.xlsx",
+                        help='Observations with an "Extracted Weather" column')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--distilled', type=str, default=DISTILLED_NLI_MODEL, help='Smaller NLI model to compare')
+    parser.add_argument('--quantize', action='store_true', help='Also time the distilled model with int8 weights')
+    args = parser.parse_args()
+
+    import pandas as pd
+    from transformers import pipeline
+
+    df = pd.read_excel(args.observations)
+    pairs = [premise_hypothesis(obs, weather) for obs, weather in
+             zip(df["Free Text Observation"].astype(str), df["Extracted Weather"].astype(str))]
+    premises, hypotheses = [p for p, _ in pairs], [h for _, h in pairs]
+
+    legacy = pipeline("text-classification", model=DEFAULT_NLI_MODEL)
+    results = {}
+    results["pipeline, one concatenated string per row"], _ = pairs_per_second(
+        lambda ps, hs: [legacy(f"{p} {h}")[0] for p, h in zip(ps, hs)], premises, hypotheses)
+
+    reference = ContradictionDetector(DEFAULT_NLI_MODEL, batch_size=args.batch_size)
+    results["batched pairs, length-sorted"], reference_labels = pairs_per_second(reference.predict, premises,
+                                                                                 hypotheses)
+    results["batched pairs, cached (second run)"], _ = pairs_per_second(reference.predict, premises, hypotheses)
+
+    variants = [(args.distilled, False)] + ([(args.distilled, True)] if args.quantize else [])
+    agreement = {}
+    for model_name, quantize in variants:
+        name = f"{model_name}{' int8' if quantize else ''}"
+        detector = ContradictionDetector(model_name, batch_size=args.batch_size, quantize=quantize)
+        results[name], labels = pairs_per_second(detector.predict, premises, hypotheses)
+        agreement[name] = sum(a[0] == b[0] for a, b in zip(labels, reference_labels)) / len(labels)
+
+    baseline = results["pipeline, one concatenated string per row"]
+    print(f"\n📊 NLI contradiction detection on {len(premises):,} pairs ({len(set(pairs)):,} unique)")
+    for name, rate in results.items():
+        print(f"{name:<48} {rate:>9,.1f} pairs/s  ({rate / baseline:.1f}x)")
+    # No gold labels ship with the data, so accuracy is measured against the full-size model
+    for name, rate in agreement.items():
+        print(f"Label agreement of {name} with {DEFAULT_NLI_MODEL}: {rate:.1%} (delta {rate - 1:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import pandas as pd
+
+RULE_KEYS = ["Sky Condition", "Rain Condition", "Wind Condition"]
+WILDCARD = "*"
+
+
+def _is_wildcard(location):
+    return pd.isna(location) or str(location).strip().lower() in ("", "none", "n/a", "any", "all", WILDCARD)
+
+
+def _rule_location(df_rules):
+    """Location Exception with blank/None values normalized to the wildcard."""
+    if "Location Exception" not in df_rules.columns:
+        return pd.Series(WILDCARD, index=df_rules.index)
+    return df_rules["Location Exception"].map(lambda loc: WILDCARD if _is_wildcard(loc) else loc)
+
+
+def build_rule_index(df_rules):
+    """Hash index {(sky, rain, wind, location): rule dict}.
+
+    Location-specific rules are keyed by their Location Exception and only ever apply
+    to that location; general rules (no Location Exception) are keyed by the wildcard.
+    As with the row-by-row loops this replaces, a later rule overwrites an earlier one
+    with the same key.
+    """
+    index = {}
+    for rule, location in zip(df_rules.to_dict("records"), _rule_location(df_rules)):
+        index[(*(rule[key] for key in RULE_KEYS), location)] = rule
+    return index
+
+
+def lookup(rule_index, sky, rain, wind, location):
+    """O(1) rule lookup: the location-specific rule if one exists, else the wildcard rule, else None."""
+    return rule_index.get((sky, rain, wind, location)) or rule_index.get((sky, rain, wind, WILDCARD))
+
+
+def matched_rule_name(rule):
+    return f"{rule['Sky Condition']} {rule['Rain Condition']} {rule['Wind Condition']}"
+
+
+def match_frame(df_observations, df_rules, default_classification="Unknown",
+                default_recommendation="No specific recommendation available."):
+    """Applies the rules to a whole observations frame as two hash joins (exact location, then wildcard).
+
+    Returns a frame aligned with df_observations with "Final Classification",
+    "Recommendation" and "Matched Rule" columns.
+    """
+    rules = df_rules.assign(_location=_rule_location(df_rules))
+    columns = RULE_KEYS + ["Classification", "Recommendation"]
+
+    exact = (rules[rules["_location"] != WILDCARD]
+             .drop_duplicates(RULE_KEYS + ["_location"], keep="last")[columns + ["_location"]]
+             .rename(columns={"_location": "Location"}))
+    wildcard = rules[rules["_location"] == WILDCARD].drop_duplicates(RULE_KEYS, keep="last")[columns]
+
+    keys = df_observations[RULE_KEYS + ["Location"]].reset_index(drop=True)
+    by_location = keys.merge(exact, on=RULE_KEYS + ["Location"], how="left")
+    by_triple = keys.merge(wildcard, on=RULE_KEYS, how="left")
+
+    classification = by_location["Classification"].combine_first(by_triple["Classification"])
+    recommendation = by_location["Recommendation"].combine_first(by_triple["Recommendation"])
+    matched = classification.notna()
+
+    result = pd.DataFrame({
+        "Final Classification": classification.fillna(default_classification),
+        "Recommendation": recommendation.fillna(default_recommendation),
+        "Matched Rule": (keys[RULE_KEYS[0]].astype(str) + " " + keys[RULE_KEYS[1]].astype(str) + " "
+                         + keys[RULE_KEYS[2]].astype(str)).where(matched, "No exact match found"),
+    })
+    result.index = df_observations.index
+    return result
@@ -1,50 +1,50 @@
 import pandas as pd
-import shap
-import openai
 import numpy as np
 import os
-import torch
-import spacy
-import matplotlib.pyplot as plt
-from collections import defaultdict
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
-from sklearn.preprocessing import LabelEncoder
-import transformers
-
-# Suppress unnecessary transformer warnings
-transformers.logging.set_verbosity_error()
-
-# Load pre-trained AI models
-nlp = spacy.load("en_core_web_sm")  # NER for extracting weather conditions & items
-sbert_model = SentenceTransformer("all-MiniLM-L6-v2")  # Semantic matching model
-nli_model = pipeline("text-classification", model="roberta-large-mnli")  # Contradiction detection
-openai.api_key = os.getenv("OPENAI_API_KEY")  # Set OpenAI API key
+import sys
+from entity_extraction import KeywordExtractor
+from nli_contradiction import ContradictionDetector, contradiction_message, premise_hypothesis
+from location_history import recommend_from_history
+from surrogate_explainer import encode_features, explain, train_surrogate
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.lazy_import import lazy_import
+from common.llm_backend import LLMClient, make_backend
+
+# Heavy libraries are imported where they are first used: SBERT and NLI (torch, transformers) when the
+# models are loaded below, shap and matplotlib for the SHAP plot at the end
+sentence_transformers = lazy_import("sentence_transformers")
+sbert_util = lazy_import("sentence_transformers.util")
+transformers = lazy_import("transformers")
+shap = lazy_import("shap")
+plt = lazy_import("matplotlib.pyplot")
+
+# Explanations: gpt-4o by default; LLM_BACKEND=ollama (or openai + LLM_HOST) points at a local server
+llm_client = LLMClient(make_backend(os.getenv("LLM_BACKEND", "openai")),
+                       max_workers=int(os.getenv("LLM_MAX_WORKERS", "8")), cache_file="ai_explanations_cache.db")
+
+# SHAP budget: rows explained and background rows, independent of report size
+shap_sample_size = int(os.getenv("WEATHER_SHAP_SAMPLES", "2000"))
+shap_background_size = int(os.getenv("WEATHER_SHAP_BACKGROUND", "200"))
 
 # Define keywords for entity recognition
 WEATHER_TERMS = {"rain", "snow", "wind", "storm", "sun", "cloud", "humidity", "fog"}
 ITEM_TERMS = {"umbrella", "coat", "hat", "sunglasses", "boots", "scarf", "gloves", "raincoat", "hoodie"}
 
+# Pure keyword lookup: tokenizer + PhraseMatcher, no tagger/parser/NER
+keyword_extractor = KeywordExtractor({"weather": WEATHER_TERMS, "items": ITEM_TERMS})
 
-def extract_entities(text):
-    """Extracts weather conditions and items using NER."""
-    doc = nlp(text.lower())
-    weather_conditions = set()
-    items = set()
 
-    for token in doc:
-        if token.text in WEATHER_TERMS:
-            weather_conditions.add(token.text)
-        if token.text in ITEM_TERMS:
-            items.add(token.text)
-
-    return ", ".join(weather_conditions) if weather_conditions else "None", ", ".join(items) if items else "None"
+def extract_entities(texts):
+    """Extracts weather conditions and items for a batch of texts."""
+    return [(", ".join(found["weather"]) or "None", ", ".join(found["items"]) or "None")
+            for found in keyword_extractor.extract(texts)]
 
 
 # Load observation data
 observations_df = pd.read_excel("observations_free_text.xlsx")
 observations_df["Extracted Weather"], observations_df["Extracted Items"] = zip(
-    *observations_df["Free Text Observation"].apply(extract_entities)
+    *extract_entities(observations_df["Free Text Observation"])
 )
 observations_df.to_excel("observations_with_entities.xlsx", index=False)
 
@@ -53,51 +53,28 @@ rules_df = pd.read_excel("rules_multi_factor.xlsx")
 rules_text = rules_df.drop(columns=["Classification", "Recommendation"]).astype(str).agg(" ".join, axis=1).tolist()
 observations_text = observations_df.drop(columns=["Free Text Observation"]).astype(str).agg(" ".join, axis=1).tolist()
 
+# Load pre-trained AI models (first use of transformers: suppress its unnecessary warnings before loading)
+transformers.logging.set_verbosity_error()
+sbert_model = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")  # Semantic matching model
+# Contradiction detection: batched premise/hypothesis pairs; set WEATHER_NLI_MODEL for a distilled model
+nli_model = ContradictionDetector(os.getenv("WEATHER_NLI_MODEL", "roberta-large-mnli"),
+                                  quantize=os.getenv("WEATHER_NLI_QUANTIZE") == "1")
+
 # Compute semantic similarity with SBERT
 rules_embeddings = sbert_model.encode(rules_text, convert_to_tensor=True)
 observations_embeddings = sbert_model.encode(observations_text, convert_to_tensor=True)
-similarity_scores = util.cos_sim(observations_embeddings, rules_embeddings)
-
-# Dictionary to track previous location observations for AI recommendations
-location_items = defaultdict(set)
-
-
-def detect_contradiction(observation, extracted_weather):
-    """Uses NLI (Natural Language Inference) to detect contradictions in observations."""
-    premise = f"The reported weather conditions are: {extracted_weather}."
-    hypothesis = f"The observation states: {observation}."
+similarity_scores = sbert_util.cos_sim(observations_embeddings, rules_embeddings)
 
-    result = nli_model(f"{premise} {hypothesis}")[0]
-    label = result["label"]
-    confidence = result["score"]
 
-    if label == "CONTRADICTION":
-        return f"⚠️ Contradiction detected ({confidence:.2f}): Observation does not align with extracted weather."
-    elif label == "NEUTRAL":
-        return f"⚠️ Neutral ({confidence:.2f}): Observation might be unclear."
-    return "✅ No contradiction detected."
+def detect_contradictions(observations, extracted_weather):
+    """Uses NLI (Natural Language Inference) to detect contradictions, one batched pass over all observations."""
+    pairs = [premise_hypothesis(observation, weather) for observation, weather in zip(observations, extracted_weather)]
+    return [contradiction_message(label, confidence) for label, confidence in
+            nli_model.predict([premise for premise, _ in pairs], [hypothesis for _, hypothesis in pairs])]
 
 
-def generate_ai_recommendations(location, extracted_items):
-    """Suggests missing weather-related items based on previous observations in other locations."""
-    recommendations = []
-    extracted_items_set = set(extracted_items.split(", ")) if extracted_items != "None" else set()
-
-    location_items[location] |= extracted_items_set
-
-    for past_location, past_items in location_items.items():
-        if past_location != location:
-            missing_items = past_items - extracted_items_set
-            if missing_items:
-                recommendations.append(
-                    f"Consider using {', '.join(missing_items)} in {location}, based on past observations in {past_location}.")
-
-    return " ".join(recommendations) if recommendations else "✅ No additional recommendations."
-
-
-def generate_ai_explanation(row):
-    """Uses GPT-4 to explain why AI made a recommendation."""
-    prompt = f"""
+def explanation_prompt(row):
+    return f"""
     The AI analyzed weather conditions, observations, and past usage patterns.
     Location: {row["Location"]}
     Weather: {row["Sky Condition"]}, {row["Rain Condition"]}, {row["Wind Condition"]}
@@ -107,69 +84,63 @@ def generate_ai_explanation(row):
     Explain why this recommendation is useful in simple terms.
     """
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert weather assistant explaining AI recommendations."},
-                {"role": "user", "content": prompt}]
-        )
-        return response["choices"][0]["message"]["content"]
-    except Exception as e:
-        return f"❌ GPT-4 explanation error: {str(e)}"
+
+def generate_ai_explanations(df):
+    """Explains every recommendation: concurrent requests, identical prompts sent once, replies cached."""
+    return llm_client.complete_many(
+        [explanation_prompt(row) for row in df.to_dict("records")],
+        system="You are an expert weather assistant explaining AI recommendations.",
+        on_error=lambda e: f"❌ AI explanation error: {str(e)}",
+    )
 
 
 # Generate AI-driven report
-report = []
-for i, obs_embedding in enumerate(observations_embeddings):
-    best_match_idx = torch.argmax(similarity_scores[i]).item()  # Find best rule match
-    best_match_rule = rules_text[best_match_idx]
-    classification = rules_df.iloc[best_match_idx]["Classification"]
-    recommendation = rules_df.iloc[best_match_idx]["Recommendation"]
-
-    report.append({
-        "Location": observations_df.iloc[i]["Location"],
-        "Sky Condition": observations_df.iloc[i]["Sky Condition"],
-        "Rain Condition": observations_df.iloc[i]["Rain Condition"],
-        "Wind Condition": observations_df.iloc[i]["Wind Condition"],
-        "Free-Text Observation": observations_df.iloc[i]["Free Text Observation"],
-        "Extracted Weather": observations_df.iloc[i]["Extracted Weather"],
-        "Extracted Items": observations_df.iloc[i]["Extracted Items"],
-        "Matched Rule": best_match_rule,
-        "Final Classification": classification,
-        "Recommendation": recommendation,
-        "Contradiction Check": detect_contradiction(
-            observations_df.iloc[i]["Free Text Observation"], observations_df.iloc[i]["Extracted Weather"]
-        ),
-        "AI-Powered Recommendations": generate_ai_recommendations(
-            observations_df.iloc[i]["Location"], observations_df.iloc[i]["Extracted Items"]
-        ),
-        "AI Explanation": None  # Will be filled later
-    })
-
-# Convert report to DataFrame
-df_report = pd.DataFrame(report)
-
-# Generate GPT-4 explanations
-df_report["AI Explanation"] = df_report.apply(generate_ai_explanation, axis=1)
-
-# **Fix SHAP Error: Convert categorical weather conditions to numeric values**
+contradiction_checks = detect_contradictions(observations_df["Free Text Observation"],
+                                             observations_df["Extracted Weather"])
+best_match_idx = similarity_scores.argmax(dim=1).cpu().numpy()  # Best rule match for every observation
+matched_rules = rules_df.iloc[best_match_idx]
+
+df_report = pd.DataFrame({
+    "Location": observations_df["Location"],
+    "Sky Condition": observations_df["Sky Condition"],
+    "Rain Condition": observations_df["Rain Condition"],
+    "Wind Condition": observations_df["Wind Condition"],
+    "Free-Text Observation": observations_df["Free Text Observation"],
+    "Extracted Weather": observations_df["Extracted Weather"],
+    "Extracted Items": observations_df["Extracted Items"],
+    "Matched Rule": np.asarray(rules_text, dtype=object)[best_match_idx],
+    "Final Classification": matched_rules["Classification"].to_numpy(),
+    "Recommendation": matched_rules["Recommendation"].to_numpy(),
+    "Contradiction Check": contradiction_checks,
+    # Items seen at other locations, aggregated per location first so the output is order-independent
+    "AI-Powered Recommendations": recommend_from_history(observations_df["Location"],
+                                                         observations_df["Extracted Items"]),
+    "AI Explanation": None  # Will be filled later
+}).reset_index(drop=True)
+
+# Generate AI explanations
+df_report["AI Explanation"] = generate_ai_explanations(df_report)
+
+# SHAP: explain a surrogate forest trained to reproduce the rule classification from the weather features
 weather_features = ["Sky Condition", "Rain Condition", "Wind Condition"]
-label_encoders = {col: LabelEncoder() for col in weather_features}
-
-for col in weather_features:
-    df_report[col] = label_encoders[col].fit_transform(df_report[col])
+encoded_features, feature_encoder = encode_features(df_report, weather_features)
+surrogate_model = train_surrogate(encoded_features, df_report["Final Classification"].astype(str))
+print(f"🌲 Surrogate fidelity to rule classification: "
+      f"{surrogate_model.score(encoded_features, df_report['Final Classification'].astype(str)):.1%}")
 
-# SHAP model interpretability (saved as an image)
-shap_explainer = shap.Explainer(lambda X: np.random.rand(len(X)), df_report[weather_features])
-shap_values = shap_explainer(df_report[weather_features])
+explained_rows, shap_attributions = explain(surrogate_model, encoded_features, shap_background_size, shap_sample_size)
+shap_attributions.join(df_report[["Location"] + weather_features]).to_csv("shap_attributions.csv",
+                                                                          index_label="Report Row")
 
 plt.figure()
-shap.summary_plot(shap_values, df_report[weather_features])
-plt.savefig("shap_summary_plot.png")  # Save as an image instead of JSON
+shap.summary_plot(shap_attributions[[f"SHAP {c}" for c in weather_features]].to_numpy(), explained_rows,
+                  feature_names=weather_features, show=False)
+plt.savefig("shap_summary_plot.png", bbox_inches="tight")  # Save as an image instead of JSON
+plt.close()
 
 print("✅ AI-powered weather analysis complete: 'final_ai_weather_report.xlsx'")
 print("✅ SHAP interpretability saved as an image: 'shap_summary_plot.png'")
+print(f"✅ Per-row SHAP attributions for {len(shap_attributions)} rows saved as: 'shap_attributions.csv'")
 
 # Save final AI-driven report
 df_report.to_excel("final_ai_weather_report.xlsx", index=False)
@@ -0,0 +1,98 @@
+import json
+import re
+
+from pydantic import BaseModel, Field, ValidationError
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class WeatherAnalysis(BaseModel):
+    """Schema the Weather agents ask the LLM to answer in."""
+
+    classification: str = Field(min_length=1, description="Short weather classification, e.g. 'Rainy and windy'")
+    recommendations: list[str] = Field(min_length=1, description="Specific, actionable recommendations")
+    explanation: str = Field(min_length=1, description="Why, in simple terms")
+
+    def to_columns(self):
+        return {
+            "Final Classification": self.classification,
+            "AI-Powered Recommendations": "; ".join(self.recommendations),
+            "AI Explanation": self.explanation,
+        }
+
+
+class FusedWeatherAnalysis(BaseModel):
+    """Every LLM-produced field of the Weather graph, requested in one call."""
+
+    extracted_weather: list[str] = Field(description="Weather condition keywords found in the observation")
+    extracted_items: list[str] = Field(description="Items mentioned in the observation, e.g. umbrella, coat, boots")
+    ai_powered_recommendations: str = Field(min_length=1, description="Detailed recommendation with precautions "
+                                                                      "and activity suggestions")
+    ai_explanation: str = Field(min_length=1, description="Why the rule recommendation fits the classification "
+                                                          "and the extracted weather")
+    contradiction_warning: str = Field(description="Contradictions in the observation, or 'None'")
+
+
+class NumberedWeatherAnalysis(FusedWeatherAnalysis):
+    observation: int = Field(description="Number of the observation this result belongs to")
+
+
+class PackedWeatherAnalysis(BaseModel):
+    """Fused results for several observations packed into one request."""
+
+    results: list[NumberedWeatherAnalysis]
+
+
+def schema_instructions(schema=WeatherAnalysis):
+    return ("Respond with a single JSON object and nothing else, matching this JSON schema:\n"
+            + json.dumps(schema.model_json_schema()))
+
+
+def parse_structured(text, schema=WeatherAnalysis):
+    """Validates an LLM reply against schema; code fences or text around the JSON object are ignored."""
+    match = _JSON_OBJECT.search(text or "")
+    if not match:
+        raise ValueError("no JSON object in reply")
+    return schema.model_validate_json(match.group(0))
+
+
+def _short_error(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'reply'}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def generate_structured(conversations, chat_many, schema=WeatherAnalysis, max_retries=2):
+    """Sends every conversation once, then re-asks only the rows whose reply fails validation.
+
+    chat_many maps a list of message lists to a list of reply strings. A retried row gets its
+    invalid reply and the validation error appended, so the model can correct itself.
+    Returns (results, replies); results[i] is None if row i still fails after max_retries.
+    """
+    conversations = [list(messages) for messages in conversations]
+    results = [None] * len(conversations)
+    replies = [""] * len(conversations)
+    pending = list(range(len(conversations)))
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        failed = []
+        for i, reply in zip(pending, chat_many([conversations[i] for i in pending])):
+            replies[i] = reply
+            try:
+                results[i] = parse_structured(reply, schema)
+            except ValueError as e:  # pydantic's ValidationError is a ValueError
+                failed.append(i)
+                conversations[i] += [
+                    {"role": "assistant", "content": reply},
+                    {"role": "user", "content": f"That reply was not valid ({_short_error(e)}). "
+                                                f"Answer again with only the JSON object."},
+                ]
+        if failed and attempt < max_retries:
+            print(f"🔁 {len(failed)} of {len(pending)} replies failed validation, retrying only those rows")
+        pending = failed
+
+    if pending:
+        print(f"⚠️ {len(pending)} rows still invalid after {max_retries} retries")
+    return results, replies
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.lazy_import import lazy_import
+
+# shap and scikit-learn are imported when a surrogate is first encoded, trained or explained
+shap = lazy_import("shap")
+sklearn_ensemble = lazy_import("sklearn.ensemble")
+sklearn_preprocessing = lazy_import("sklearn.preprocessing")
+
+
+def encode_features(df, features):
+    """Ordinal-encodes categorical weather columns; unseen values map to -1."""
+    encoder = sklearn_preprocessing.OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    encoded = encoder.fit_transform(df[features].astype(str))
+    return pd.DataFrame(encoded, columns=features, index=df.index), encoder
+
+
+def train_surrogate(X, y, n_estimators=100, max_depth=8, seed=42):
+    """Random forest that mimics the rule classification from the encoded weather features."""
+    model = sklearn_ensemble.RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                                    random_state=seed, n_jobs=-1)
+    return model.fit(X, y)
+
+
+def explain(model, X, background_size=200, sample_size=2000, seed=42):
+    """TreeExplainer attributions for at most sample_size rows against a background sample.
+
+    Cost grows with sample_size x background_size, not with the report size.
+    Returns (explained rows, attributions for each row's predicted class).
+    """
+    background = X.sample(min(background_size, len(X)), random_state=seed)
+    sample = X.sample(min(sample_size, len(X)), random_state=seed)
+    explainer = shap.TreeExplainer(model, data=background, feature_perturbation="interventional")
+
+    values = explainer.shap_values(sample, check_additivity=False)
+    # Older shap returns one (rows, features) array per class, newer a (rows, features, classes) array
+    values = np.stack(values, axis=-1) if isinstance(values, list) else np.asarray(values)
+    if values.ndim == 2:
+        values = values[:, :, None]
+
+    predicted = model.predict(sample)
+    class_positions = np.searchsorted(model.classes_, predicted)
+    predicted_values = values[np.arange(len(sample)), :, class_positions]
+
+    attributions = pd.DataFrame(predicted_values, columns=[f"SHAP {c}" for c in X.columns], index=sample.index)
+    attributions.insert(0, "Surrogate Prediction", predicted)
+    return sample, attributions
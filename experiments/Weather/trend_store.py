@@ -0,0 +1,114 @@
+import hashlib
+import sqlite3
+
+import pandas as pd
+
+CONDITION_COLUMNS = ["Sky Condition", "Rain Condition", "Wind Condition"]
+# Raw observations and the rendered report name the free-text column differently
+OBSERVATION_TEXT_COLUMNS = ["Free Text Observation", "Free-Text Observation"]
+
+
+def observation_keys(df):
+    """Identity of every observation: location, free text and its occurrence among identical rows.
+
+    Only these columns are hashed, so the same observations get the same keys whether they come
+    from the raw observations or from a report (whose generated text columns change on every run).
+    """
+    text_column = next((c for c in OBSERVATION_TEXT_COLUMNS if c in df.columns), None)
+    text = df[text_column].astype(str) if text_column else pd.Series("", index=df.index)
+    identity = df["Location"].astype(str) + "\x1f" + text
+    occurrence = identity.groupby(identity).cumcount().astype(str)
+    return [hashlib.sha1(f"{i}\x1f{n}".encode("utf-8")).hexdigest() for i, n in zip(identity, occurrence)]
+
+
+class TrendStore:
+    """Per-location condition counts kept up to date as observations are processed.
+
+    Every observation is recorded once under its key with its condition values, so updating
+    costs the number of new or edited observations. Reprocessing the same observations
+    changes nothing; an edited observation moves its counts from the old values to the new ones.
+    Charts and mode tables read the small counts table, however much history exists.
+    """
+
+    def __init__(self, db_file="weather_trends.db"):
+        self.conn = sqlite3.connect(db_file)
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS condition_counts (
+                location TEXT,
+                condition TEXT,
+                value TEXT,
+                count INTEGER,
+                PRIMARY KEY (location, condition, value)
+            )
+            """)
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trend_observations (
+                observation_key TEXT PRIMARY KEY,
+                location TEXT,
+                sky TEXT,
+                rain TEXT,
+                wind TEXT
+            )
+            """)
+
+    def _stored(self, keys, chunk_size=500):
+        stored = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            rows = self.conn.execute(
+                f"SELECT observation_key, location, sky, rain, wind FROM trend_observations "
+                f"WHERE observation_key IN ({','.join('?' * len(chunk))})", chunk)
+            stored.update((row[0], row[1:]) for row in rows)
+        return stored
+
+    def update(self, df):
+        """Adds new observations and moves the counts of edited ones; returns how many changed."""
+        keys = observation_keys(df)
+        values = df[["Location"] + CONDITION_COLUMNS].astype(str).itertuples(index=False, name=None)
+        current = dict(zip(keys, values))
+        stored = self._stored(list(current))
+
+        deltas = {}
+        changed = []
+        for key, row in current.items():
+            old = stored.get(key)
+            if old == row:
+                continue
+            if old is not None:
+                for condition, value in zip(CONDITION_COLUMNS, old[1:]):
+                    deltas[(old[0], condition, value)] = deltas.get((old[0], condition, value), 0) - 1
+            for condition, value in zip(CONDITION_COLUMNS, row[1:]):
+                deltas[(row[0], condition, value)] = deltas.get((row[0], condition, value), 0) + 1
+            changed.append((key,) + row)
+
+        if changed:
+            with self.conn:
+                self.conn.executemany("""
+                INSERT INTO condition_counts (location, condition, value, count) VALUES (?, ?, ?, ?)
+                ON CONFLICT (location, condition, value) DO UPDATE SET count = count + excluded.count
+                """, [key + (delta,) for key, delta in deltas.items() if delta])
+                self.conn.execute("DELETE FROM condition_counts WHERE count <= 0")
+                self.conn.executemany("INSERT OR REPLACE INTO trend_observations VALUES (?, ?, ?, ?, ?)", changed)
+        return len(changed)
+
+    def counts(self, condition="Sky Condition"):
+        """Location x value table of counts for one condition column."""
+        df = pd.read_sql_query("SELECT location, value, count FROM condition_counts WHERE condition = ?",
+                               self.conn, params=(condition,))
+        return (df.pivot(index="location", columns="value", values="count").fillna(0).astype(int)
+                .rename_axis(index="Location", columns=condition))
+
+    def modes(self):
+        """Most frequent value per location and condition column (ties go to the smallest value, like mode()[0])."""
+        df = pd.read_sql_query("SELECT location, condition, value, count FROM condition_counts", self.conn)
+        df = df.sort_values(["location", "condition", "count", "value"], ascending=[True, True, False, True])
+        modes = df.drop_duplicates(["location", "condition"]).pivot(index="location", columns="condition",
+                                                                    values="value")
+        return modes.reindex(columns=CONDITION_COLUMNS).rename_axis(index="Location", columns=None)
+
+    def total_rows(self):
+        return self.conn.execute("SELECT COUNT(*) FROM trend_observations").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,271 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+class Resources:
+    """Models and parsed inputs shared by all stages; each is loaded on first use, at most once.
+
+    Model libraries are imported inside the loaders, so a run only pays for what its stages use.
+    """
+
+    def __init__(self, observations_file, rules_file, trend_db="weather_trends.db"):
+        self.observations_file = observations_file
+        self.rules_file = rules_file
+        self.trend_db = trend_db
+        self._values = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.load_seconds = {}
+
+    def _get(self, name, loader):
+        with self._guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                start = time.perf_counter()
+                self._values[name] = loader()
+                self.load_seconds[name] = time.perf_counter() - start
+            return self._values[name]
+
+    @property
+    def observations(self):
+        return self._get("observations", lambda: pd.read_excel(self.observations_file))
+
+    @property
+    def rules(self):
+        return self._get("rules", lambda: pd.read_excel(self.rules_file))
+
+    @property
+    def pos_nlp(self):
+        def load():
+            from entity_extraction import load_pos_pipeline
+            return load_pos_pipeline()
+        return self._get("pos_nlp", load)
+
+    @property
+    def keyword_extractor(self):
+        def load():
+            from entity_extraction import KeywordExtractor
+            return KeywordExtractor({"weather": WEATHER_TERMS, "items": ITEM_TERMS})
+        return self._get("keyword_extractor", load)
+
+    @property
+    def sbert(self):
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer("all-MiniLM-L6-v2")
+        return self._get("sbert", load)
+
+    @property
+    def nli(self):
+        def load():
+            from nli_contradiction import ContradictionDetector
+            return ContradictionDetector(os.getenv("WEATHER_NLI_MODEL", "roberta-large-mnli"),
+                                         quantize=os.getenv("WEATHER_NLI_QUANTIZE") == "1")
+        return self._get("nli", load)
+
+    @property
+    def llm_client(self):
+        def load():
+            from common.llm_backend import LLMClient, make_backend
+            return LLMClient(make_backend(), max_workers=int(os.getenv("LLM_MAX_WORKERS", "4")),
+                             cache_file="ai_explanations_cache.db")
+        return self._get("llm_client", load)
+
+
+WEATHER_TERMS = {"rain", "snow", "wind", "storm", "sun", "cloud", "humidity", "fog"}
+ITEM_TERMS = {"umbrella", "coat", "hat", "sunglasses", "boots", "scarf", "gloves", "raincoat", "hoodie"}
+
+
+# === Stages: each returns new report columns aligned with the observations ===
+def stage_rules(resources, columns):
+    """Hash-join rule matching (no models)."""
+    from rule_index import match_frame
+    return match_frame(resources.observations, resources.rules)
+
+
+def stage_entities(resources, columns):
+    """Weather terms and items via the tokenizer-only PhraseMatcher."""
+    found = resources.keyword_extractor.extract(resources.observations["Free Text Observation"])
+    return pd.DataFrame({
+        "Extracted Weather": [", ".join(f["weather"]) or "None" for f in found],
+        "Extracted Items": [", ".join(f["items"]) or "None" for f in found],
+    }, index=resources.observations.index)
+
+
+def stage_nouns(resources, columns):
+    """Nouns and proper nouns from the POS-only spaCy pipeline."""
+    from entity_extraction import extract_pos_terms
+    nouns = extract_pos_terms(resources.observations["Free Text Observation"], resources.pos_nlp)
+    return pd.DataFrame({"Extracted Nouns": [", ".join(terms) for terms in nouns]}, index=resources.observations.index)
+
+
+def stage_semantic(resources, columns):
+    """Best rule by SBERT cosine similarity between observation and rule text."""
+    from sentence_transformers import util
+    rules = resources.rules
+    rules_text = rules.drop(columns=["Classification", "Recommendation"]).astype(str).agg(" ".join, axis=1).tolist()
+    observations_text = resources.observations.join(columns).drop(columns=["Free Text Observation"]).astype(
+        str).agg(" ".join, axis=1).tolist()
+    similarity = util.cos_sim(resources.sbert.encode(observations_text, convert_to_tensor=True),
+                              resources.sbert.encode(rules_text, convert_to_tensor=True))
+    best = similarity.argmax(dim=1).cpu().numpy()
+    return pd.DataFrame({
+        "Semantic Rule": [rules_text[i] for i in best],
+        "Semantic Classification": rules["Classification"].to_numpy()[best],
+    }, index=resources.observations.index)
+
+
+def stage_contradictions(resources, columns):
+    """Batched NLI between the extracted weather and the observation."""
+    from nli_contradiction import contradiction_message, premise_hypothesis
+    pairs = [premise_hypothesis(obs, weather) for obs, weather in
+             zip(resources.observations["Free Text Observation"], columns["Extracted Weather"])]
+    labels = resources.nli.predict([p for p, _ in pairs], [h for _, h in pairs])
+    return pd.DataFrame({"Contradiction Check": [contradiction_message(label, score) for label, score in labels]},
+                        index=resources.observations.index)
+
+
+def stage_history(resources, columns):
+    """Items seen at other locations (order-independent bitset recommender)."""
+    from location_history import recommend_from_history
+    return pd.DataFrame({"AI-Powered Recommendations": recommend_from_history(
+        resources.observations["Location"], columns["Extracted Items"])}, index=resources.observations.index)
+
+
+def stage_explanations(resources, columns):
+    """LLM explanation per row through the shared, cached, concurrent backend."""
+    df = resources.observations.join(columns)
+    prompts = [f"""
+    The AI analyzed weather conditions, observations, and past usage patterns.
+    Location: {row["Location"]}
+    Weather: {row["Sky Condition"]}, {row["Rain Condition"]}, {row["Wind Condition"]}
+    Observed Items: {row["Extracted Items"]}
+    Recommendation: {row["AI-Powered Recommendations"]}
+
+    Explain why this recommendation is useful in simple terms.
+    """ for row in df.to_dict("records")]
+    explanations = resources.llm_client.complete_many(
+        prompts, system="You are an expert weather assistant explaining AI recommendations.",
+        on_error=lambda e: f"❌ AI explanation error: {str(e)}")
+    return pd.DataFrame({"AI Explanation": explanations}, index=resources.observations.index)
+
+
+def stage_shap(resources, columns):
+    """SHAP attributions of a surrogate forest reproducing the rule classification (saved as CSV)."""
+    from surrogate_explainer import encode_features, explain, train_surrogate
+    weather_features = ["Sky Condition", "Rain Condition", "Wind Condition"]
+    df = resources.observations.join(columns).reset_index(drop=True)
+    encoded_features, _ = encode_features(df, weather_features)
+    surrogate_model = train_surrogate(encoded_features, df["Final Classification"].astype(str))
+    _, shap_attributions = explain(surrogate_model, encoded_features,
+                                   int(os.getenv("WEATHER_SHAP_BACKGROUND", "200")),
+                                   int(os.getenv("WEATHER_SHAP_SAMPLES", "2000")))
+    shap_attributions.join(df[["Location"] + weather_features]).to_csv("shap_attributions.csv",
+                                                                       index_label="Report Row")
+    return pd.DataFrame(index=resources.observations.index)
+
+
+def stage_trends(resources, columns):
+    """Folds the observations into the incremental trend aggregates (shared with the HTML report)."""
+    from trend_store import TrendStore
+    store = TrendStore(resources.trend_db)
+    changed = store.update(resources.observations)
+    print(f"📈 Trend aggregates updated with {changed} observations: {store.total_rows()} so far")
+    store.close()
+    return pd.DataFrame(index=resources.observations.index)
+
+
+# name -> (function, dependencies)
+STAGES = {
+    "rules": (stage_rules, []),
+    "entities": (stage_entities, []),
+    "nouns": (stage_nouns, []),
+    "semantic": (stage_semantic, ["entities"]),
+    "contradictions": (stage_contradictions, ["entities"]),
+    "history": (stage_history, ["entities"]),
+    "explanations": (stage_explanations, ["entities", "history"]),
+    "shap": (stage_shap, ["rules"]),
+    "trends": (stage_trends, []),
+}
+
+
+def resolve(stages):
+    """Requested stages plus everything they depend on."""
+    selected = set()
+    pending = list(stages)
+    while pending:
+        name = pending.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}; choose from {', '.join(STAGES)}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(STAGES[name][1])
+    return selected
+
+
+def run_stages(resources, stages, workers=4):
+    """Runs the stage DAG: every stage whose dependencies are done starts at once, up to workers threads."""
+    selected = resolve(stages)
+    columns = pd.DataFrame(index=resources.observations.index)
+    outputs = {}
+    timings = {}
+    running = {}
+
+    def run(name, inputs):
+        start = time.perf_counter()
+        result = STAGES[name][0](resources, inputs)
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while len(outputs) < len(selected):
+            for name in sorted(selected - set(outputs) - set(running.values())):
+                dependencies = STAGES[name][1]
+                if all(dep in outputs for dep in dependencies):
+                    inputs = columns[[column for dep in dependencies for column in outputs[dep]]]
+                    running[pool.submit(run, name, inputs)] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                result, timings[name] = future.result()
+                outputs[name] = list(result.columns)
+                columns = columns.join(result)
+                print(f"✅ Stage {name} finished in {timings[name]:.2f}s")
+    return columns, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather pipeline: run selected stages as a DAG with shared models")
+    parser.add_argument('--stages', type=str, default="rules,entities,history",
+                        help=f'Comma-separated stages ({", ".join(STAGES)}); dependencies are added')
+    parser.add_argument('--observations', type=str, default="observations_free_text.xlsx")
+    parser.add_argument('--rules', type=str, default="rules_multi_factor.xlsx")
+    parser.add_argument('--output', type=str, default="weather_pipeline_report.xlsx")
+    parser.add_argument('--trend-db', type=str, default="weather_trends.db", help='Incremental trend aggregates')
+    parser.add_argument('--workers', type=int, default=4, help='Stages that may run at the same time')
+    parser.add_argument('--list', action='store_true', help='List the stages and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (function, deps) in STAGES.items():
+            print(f"{name:<16} {function.__doc__}  (after: {', '.join(deps) or '-'})")
+        return
+
+    resources = Resources(args.observations, args.rules, args.trend_db)
+    columns, timings = run_stages(resources, [s.strip() for s in args.stages.split(",") if s.strip()], args.workers)
+
+    resources.observations.join(columns).to_excel(args.output, index=False)
+    print(f"✅ Weather pipeline report saved as: {args.output}")
+    print("⏱️ Loaded: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in resources.load_seconds.items()))
+
+
+if __name__ == "__main__":
+    main()
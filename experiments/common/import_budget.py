@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+
+EXPERIMENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must only be imported on first use, never at module import
+HEAVY_MODULES = {"shap", "transformers", "seaborn", "matplotlib", "spacy", "torch", "faiss", "sentence_transformers",
+                 "sklearn"}
+
+# Entry points and shared modules that can be imported without running anything
+DEFAULT_TARGETS = [
+    "Weather/weather_pipeline.py",
+    "Weather/entity_extraction.py",
+    "Weather/nli_contradiction.py",
+    "Weather/surrogate_explainer.py",
+    "Weather/location_history.py",
+    "Weather/trend_store.py",
+    "TIME/time_ai_olama_score.py",
+    "common/llm_backend.py",
+    "common/lazy_import.py",
+]
+
+
+def import_profile(path):
+    """Imports path in a fresh interpreter with -X importtime.
+
+    Returns (cumulative microseconds of the module's import, top-level packages it pulled in).
+    """
+    directory, file_name = os.path.split(os.path.abspath(path))
+    module = os.path.splitext(file_name)[0]
+    if not module.isidentifier():
+        raise ValueError(f"{path} cannot be imported by name")
+
+    python_path = [directory, EXPERIMENTS_DIR] + [p for p in os.getenv("PYTHONPATH", "").split(os.pathsep) if p]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=directory, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative, packages = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue  # header line
+        packages.add(name.strip().split(".")[0])
+        if name.rstrip() == f" {module}":
+            cumulative = int(total)
+    if cumulative is None:
+        raise RuntimeError(f"{module} not found in the -X importtime output")
+    return cumulative, packages
+
+
+def check(target, budget_ms, repeat):
+    """Best of repeat runs (the first one also pays for .pyc compilation); returns a list of problems."""
+    runs = [import_profile(os.path.join(EXPERIMENTS_DIR, target)) for _ in range(repeat)]
+    milliseconds = min(cumulative for cumulative, _ in runs) / 1000
+    heavy = sorted(runs[0][1] & HEAVY_MODULES)
+
+    problems = []
+    if milliseconds > budget_ms:
+        problems.append(f"import took {milliseconds:.0f} ms (budget {budget_ms:.0f} ms)")
+    if heavy:
+        problems.append(f"imports {', '.join(heavy)} eagerly")
+    status = f" - {'; '.join(problems)}" if problems else ""
+    print(f"{'❌' if problems else '✅'} {target}: {milliseconds:.0f} ms{status}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when importing an entry point exceeds its startup budget")
+    parser.add_argument('targets', nargs='*', help='Python files relative to experiments/ (default: shared entry points)')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")),
+                        help='Maximum cumulative import time per target')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per target; the fastest one counts')
+    args = parser.parse_args()
+
+    failures = 0
+    for target in args.targets or DEFAULT_TARGETS:
+        try:
+            failures += bool(check(target, args.budget_ms, args.repeat))
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {target}: {e}")
+            failures += 1
+
+    if failures:
+        print(f"❌ {failures} target{'s' if failures > 1 else ''} failed the import budget check")
+        sys.exit(1)
+    print("✅ All targets within the import budget")
+
+
+if __name__ == "__main__":
+    main()
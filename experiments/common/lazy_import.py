@@ -0,0 +1,33 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module and imports it the first time one of its attributes is read."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Returns the module if it is already imported, otherwise a proxy that imports it on first use.
+
+    Heavy libraries (torch, transformers, shap, spacy, matplotlib, ...) then cost nothing at
+    startup for code paths that never touch them.
+    """
+    return sys.modules.get(name) or LazyModule(name)
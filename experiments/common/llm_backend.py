@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LLMBackend(ABC):
+    """One chat completion per call; subclasses talk to a specific server."""
+
+    name = "base"
+
+    def __init__(self, model):
+        self.model = model
+
+    @abstractmethod
+    def chat(self, messages):
+        """Returns the assistant's reply text for a list of {"role", "content"} messages."""
+
+
+class OllamaBackend(LLMBackend):
+    """Local Ollama server; run it with OLLAMA_NUM_PARALLEL >= the client's max_workers.
+
+    format="json" or a JSON schema dict constrains the reply (schemas need Ollama 0.5+).
+    """
+
+    name = "ollama"
+
+    def __init__(self, model="llama3.2", host=None, options=None, format=None):
+        super().__init__(model)
+        from common.ollama_client import OllamaClient
+        self.client = OllamaClient(model, host=host, options=options)
+        self.format = format
+
+    def chat(self, messages):
+        kwargs = {"format": self.format} if self.format else {}
+        return self.client.chat(messages, **kwargs)["message"]["content"]
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions; api_base points it at any OpenAI-compatible local server."""
+
+    name = "openai"
+
+    def __init__(self, model="gpt-4o", api_base=None, api_key=None):
+        super().__init__(model)
+        import openai
+        self.openai = openai
+        self.api_base = api_base
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+
+    def chat(self, messages):
+        kwargs = {"api_base": self.api_base} if self.api_base else {}
+        response = self.openai.ChatCompletion.create(model=self.model, messages=messages, api_key=self.api_key,
+                                                     **kwargs)
+        return response["choices"][0]["message"]["content"]
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend for tests: the reply depends only on the messages."""
+
+    name = "stub"
+
+    def __init__(self, model="stub", delay=0.0):
+        super().__init__(model)
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def chat(self, messages):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+        digest = prompt_hash(self.name, self.model, messages)[:12]
+        last_line = next((line.strip() for line in reversed(messages[-1]["content"].splitlines()) if line.strip()), "")
+        return f"[stub {digest}] {last_line}"
+
+
+BACKENDS = {"ollama": OllamaBackend, "openai": OpenAIBackend, "stub": StubBackend}
+
+
+def make_backend(kind=None, model=None, **kwargs):
+    """Backend from arguments or the LLM_BACKEND / LLM_MODEL / LLM_HOST environment variables."""
+    kind = kind or os.getenv("LLM_BACKEND", "ollama")
+    model = model or os.getenv("LLM_MODEL")
+    if kind == "ollama" and os.getenv("LLM_HOST"):
+        kwargs.setdefault("host", os.getenv("LLM_HOST"))
+    if kind == "openai" and os.getenv("LLM_HOST"):
+        kwargs.setdefault("api_base", os.getenv("LLM_HOST"))
+    return BACKENDS[kind](**({"model": model} if model else {}), **kwargs)
+
+
+def prompt_hash(backend_name, model, messages):
+    payload = json.dumps([backend_name, model, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LLMClient:
+    """Concurrent, cached dispatch of many chat requests to one backend.
+
+    Identical prompts are sent once; replies are cached by prompt hash in memory and,
+    when cache_file is given, in SQLite so reruns skip finished rows. max_workers
+    requests are in flight at a time, which should match the server's parallelism.
+    """
+
+    def __init__(self, backend, max_workers=8, cache_file=None, retries=3):
+        self.backend = backend
+        self.max_workers = max_workers
+        self.retries = retries
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.conn = None
+        if cache_file:
+            self.conn = sqlite3.connect(cache_file, check_same_thread=False)
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (prompt_hash TEXT PRIMARY KEY, reply TEXT)")
+
+    def _cached(self, key):
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+            if self.conn is not None:
+                row = self.conn.execute("SELECT reply FROM llm_cache WHERE prompt_hash = ?", (key,)).fetchone()
+                if row:
+                    self.cache[key] = row[0]
+                    return row[0]
+        return None
+
+    def _store(self, key, reply):
+        with self.lock:
+            self.cache[key] = reply
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("INSERT OR REPLACE INTO llm_cache (prompt_hash, reply) VALUES (?, ?)",
+                                      (key, reply))
+
+    def _call(self, messages):
+        for attempt in range(self.retries):
+            try:
+                return self.backend.chat(messages)
+            except Exception:
+                if attempt == self.retries - 1:
+                    raise
+                time.sleep(2 ** attempt + random.uniform(0, 1))
+
+    def chat(self, messages):
+        return self.chat_many([messages])[0]
+
+    def chat_many(self, conversations, on_error=None):
+        """Replies for a list of message lists, in order.
+
+        A failing request raises, or with on_error its reply becomes on_error(exception)
+        (not cached, so the next run retries it).
+        """
+        keys = [prompt_hash(self.backend.name, self.backend.model, messages) for messages in conversations]
+        replies = {key: self._cached(key) for key in set(keys)}
+        pending = {key: messages for key, messages in zip(keys, conversations) if replies[key] is None}
+
+        def run(item):
+            key, messages = item
+            try:
+                reply = self._call(messages)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                return key, on_error(e)
+            self._store(key, reply)
+            return key, reply
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                replies.update(pool.map(run, pending.items()))
+        return [replies[key] for key in keys]
+
+    def complete_many(self, prompts, system=None, on_error=None):
+        """chat_many for single user prompts, with an optional shared system message."""
+        prefix = [{"role": "system", "content": system}] if system else []
+        return self.chat_many([prefix + [{"role": "user", "content": prompt}] for prompt in prompts], on_error)
@@ -0,0 +1,187 @@
+import contextvars
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+# Node currently executing in this thread/context, so LLM calls can be attributed to it
+_current_node = contextvars.ContextVar("current_node", default=None)
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram: each power-of-two range is split into equal sub-buckets,
+    which bounds the relative error of any percentile to 1 / sub_buckets."""
+
+    def __init__(self, sub_buckets=32, unit=1e-6):
+        self.sub_buckets = sub_buckets
+        self.unit = unit  # resolution of the smallest bucket, in seconds
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket(self, value):
+        units = max(value / self.unit, 1.0)
+        exponent = int(math.floor(math.log2(units)))
+        sub = int((units / 2 ** exponent - 1.0) * self.sub_buckets)
+        return exponent, min(sub, self.sub_buckets - 1)
+
+    def _bucket_value(self, bucket):
+        exponent, sub = bucket
+        return (1.0 + (sub + 0.5) / self.sub_buckets) * 2 ** exponent * self.unit
+
+    def record(self, value):
+        self.buckets[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(p / 100.0 * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(max(self._bucket_value(bucket), self.min), self.max)
+        return self.max
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            **{f"p{p:g}": self.percentile(p) for p in percentiles},
+        }
+
+
+class NodeMetrics:
+    """Per-node wall time, CPU time, call counts and LLM token counts for LangGraph pipelines.
+
+    Wrap nodes with instrument(); call record_llm_call(response) after each ollama.chat
+    inside a node to attribute its call and token counts to that node.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.lock = threading.Lock()
+        self.wall = defaultdict(LatencyHistogram)
+        self.cpu = defaultdict(LatencyHistogram)
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.llm_calls = defaultdict(int)
+        self.prompt_tokens = defaultdict(int)
+        self.completion_tokens = defaultdict(int)
+
+    def instrument(self, name, node):
+        """Returns node wrapped so every invocation is recorded under name."""
+
+        def wrapper(state):
+            token = _current_node.set((self, name))
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            failed = False
+            try:
+                return node(state)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+                _current_node.reset(token)
+                with self.lock:
+                    self.wall[name].record(wall)
+                    self.cpu[name].record(cpu)
+                    self.calls[name] += 1
+                    self.errors[name] += failed
+
+        wrapper.__name__ = getattr(node, "__name__", name)
+        wrapper.__doc__ = getattr(node, "__doc__", None)
+        return wrapper
+
+    def _record_llm(self, name, response):
+        with self.lock:
+            self.llm_calls[name] += 1
+            self.prompt_tokens[name] += _response_field(response, "prompt_eval_count")
+            self.completion_tokens[name] += _response_field(response, "eval_count")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pipeline": self.pipeline,
+                "nodes": {name: {
+                    "calls": self.calls[name],
+                    "errors": self.errors[name],
+                    "wall_seconds": self.wall[name].summary(),
+                    "cpu_seconds": self.cpu[name].summary(),
+                    "llm_calls": self.llm_calls[name],
+                    "prompt_tokens": self.prompt_tokens[name],
+                    "completion_tokens": self.completion_tokens[name],
+                } for name in sorted(self.calls)},
+            }
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def export_prometheus(self, path):
+        """Writes the metrics in Prometheus text exposition format (summaries + counters)."""
+        snapshot = self.snapshot()
+        lines = []
+        for metric, key in (("langgraph_node_wall_seconds", "wall_seconds"),
+                            ("langgraph_node_cpu_seconds", "cpu_seconds")):
+            lines.append(f"# TYPE {metric} summary")
+            for name, node in snapshot["nodes"].items():
+                labels = f'pipeline="{self.pipeline}",node="{name}"'
+                for quantile in ("50", "90", "99", "99.9"):
+                    lines.append(f'{metric}{{{labels},quantile="{float(quantile) / 100:g}"}} {node[key]["p" + quantile]:.9f}')
+                lines.append(f"{metric}_sum{{{labels}}} {node[key]['sum']:.9f}")
+                lines.append(f"{metric}_count{{{labels}}} {node[key]['count']}")
+        for metric, key in (("langgraph_node_calls_total", "calls"),
+                            ("langgraph_node_errors_total", "errors"),
+                            ("langgraph_node_llm_calls_total", "llm_calls"),
+                            ("langgraph_node_prompt_tokens_total", "prompt_tokens"),
+                            ("langgraph_node_completion_tokens_total", "completion_tokens")):
+            lines.append(f"# TYPE {metric} counter")
+            for name, node in snapshot["nodes"].items():
+                lines.append(f'{metric}{{pipeline="{self.pipeline}",node="{name}"}} {node[key]}')
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export(self, basename):
+        """Writes <basename>.json and <basename>.prom."""
+        self.export_json(basename + ".json")
+        self.export_prometheus(basename + ".prom")
+
+    def report(self):
+        """Human-readable per-node table, slowest total wall time first."""
+        nodes = self.snapshot()["nodes"]
+        rows = [f"{'node':<28} {'calls':>6} {'p50 ms':>9} {'p99 ms':>9} {'cpu ms':>9} {'llm':>5} {'tokens':>8}"]
+        for name, node in sorted(nodes.items(), key=lambda item: item[1]["wall_seconds"]["sum"], reverse=True):
+            rows.append(f"{name:<28} {node['calls']:>6} {node['wall_seconds']['p50'] * 1000:>9.2f} "
+                        f"{node['wall_seconds']['p99'] * 1000:>9.2f} {node['cpu_seconds']['mean'] * 1000:>9.2f} "
+                        f"{node['llm_calls']:>5} {node['prompt_tokens'] + node['completion_tokens']:>8}")
+        return "\n".join(rows)
+
+
+def _response_field(response, key):
+    """Reads a token counter from an ollama response (dict or ChatResponse object)."""
+    try:
+        value = response[key]
+    except (KeyError, TypeError):
+        value = getattr(response, key, 0)
+    return int(value or 0)
+
+
+def record_llm_call(response):
+    """Attributes one LLM call (and its prompt/completion token counts) to the node running now."""
+    current = _current_node.get()
+    if current is not None:
+        metrics, name = current
+        metrics._record_llm(name, response)
+    return response
@@ -0,0 +1,88 @@
+import os
+import textwrap
+import threading
+
+import ollama
+
+from common.node_metrics import record_llm_call
+
+# How long the server keeps the model loaded after a call (Ollama's own default is 5 minutes)
+DEFAULT_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def call_timing(response):
+    """Load, prompt-eval and generation time (seconds) and token counts from an ollama response."""
+
+    def field(key):
+        try:
+            value = response[key]
+        except (KeyError, TypeError):
+            value = getattr(response, key, 0)
+        return value or 0
+
+    timing = {
+        "load_seconds": field("load_duration") / 1e9,
+        "prompt_tokens": field("prompt_eval_count"),
+        "prompt_eval_seconds": field("prompt_eval_duration") / 1e9,
+        "completion_tokens": field("eval_count"),
+        "generation_seconds": field("eval_duration") / 1e9,
+        "total_seconds": field("total_duration") / 1e9,
+    }
+    return timing
+
+
+class OllamaClient:
+    """ollama.chat with the model kept resident, static context first and per-call timings.
+
+    Ollama reuses the KV cache of a prompt prefix it has already evaluated, so messages
+    are built as [static system context, per-call instructions, user content]: the static
+    part is byte-identical on every call and only the tail is re-evaluated.
+    """
+
+    def __init__(self, model="llama3.2", host=None, keep_alive=DEFAULT_KEEP_ALIVE, options=None, verbose=False):
+        self.model = model
+        self.client = ollama.Client(host=host) if host else ollama
+        self.keep_alive = keep_alive
+        self.options = options
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.timings = []
+
+    @staticmethod
+    def build_messages(static_context, user_content, instructions=None):
+        """Static context as the first system message, per-call instructions next, the dynamic part last."""
+        messages = [{"role": "system", "content": textwrap.dedent(static_context).strip()}] if static_context else []
+        if instructions:
+            messages.append({"role": "system", "content": instructions})
+        messages.append({"role": "user", "content": textwrap.dedent(user_content).strip()})
+        return messages
+
+    def warm_up(self):
+        """Loads the model (an empty prompt generates nothing) so the first real call skips the load."""
+        self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+
+    def chat(self, messages, model=None, **kwargs):
+        kwargs.setdefault("options", self.options)
+        response = self.client.chat(model=model or self.model, messages=messages, keep_alive=self.keep_alive,
+                                    **kwargs)
+        record_llm_call(response)
+        timing = call_timing(response)
+        with self.lock:
+            self.timings.append(timing)
+        if self.verbose:
+            print(f"⏱️ prompt eval {timing['prompt_tokens']} tok in {timing['prompt_eval_seconds']:.2f}s, "
+                  f"generation {timing['completion_tokens']} tok in {timing['generation_seconds']:.2f}s, "
+                  f"load {timing['load_seconds']:.2f}s")
+        return response
+
+    def report(self):
+        """Totals over all calls: time spent evaluating prompts vs generating, and model loads."""
+        with self.lock:
+            timings = list(self.timings)
+        if not timings:
+            return "No Ollama calls recorded."
+        total = {key: sum(t[key] for t in timings) for key in timings[0]}
+        loads = sum(t["load_seconds"] > 0.5 for t in timings)
+        return (f"📊 {len(timings)} Ollama calls: prompt eval {total['prompt_tokens']} tok / "
+                f"{total['prompt_eval_seconds']:.1f}s, generation {total['completion_tokens']} tok / "
+                f"{total['generation_seconds']:.1f}s, model loads {loads}")
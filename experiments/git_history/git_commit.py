@@ -2,13 +2,16 @@ import git
 import argparse
 import os
 import sqlite3
-import ollama
+import sys
 import mimetypes
 import colorama
 from colorama import Fore, Style
 from datetime import datetime
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ollama_client import OllamaClient
+
 colorama.init(autoreset=True)
 
 
@@ -111,15 +114,20 @@ def get_diff(repo, commits, index1, index2):
 
 def summarize_diff_ollama(diff_groups, readme_content, language, model="mistral"):
     """Use Ollama to generate a summary of code changes with README context and selected language."""
+    client = OllamaClient(model)
+    # The README is the same for every file, so it leads the prompt and the server reuses its evaluated prefix
+    static_context = f"""
+            You are a precise assistant that summarizes specific code changes.
+
+            Repository README:
+            {readme_content}
+            """
     summaries = {}
     for file_type, files in diff_groups.items():
         file_summaries = {}
         for file_path, changes in files.items():
             diff_text = sanitize_text("\n".join(changes[:1000]))  # Limit input to avoid overloading model
             prompt = f"""
-            Repository README:
-            {readme_content}
-
             Here is a git diff for the file: {file_path}
 
             {diff_text}
@@ -127,12 +135,10 @@ def summarize_diff_ollama(diff_groups, readme_content, language, model="mistral"
             Summarize these changes in {language}, specifying what functions, variables, or logic were modified.
             Focus on what changed rather than listing filenames.
             """
-            response = ollama.chat(model=model, messages=[
-                {"role": "system", "content": "You are a precise assistant that summarizes specific code changes."},
-                {"role": "user", "content": prompt}
-            ])
+            response = client.chat(client.build_messages(static_context, prompt))
             file_summaries[file_path] = sanitize_text(response["message"]["content"].strip())
         summaries[file_type] = file_summaries
+    print(Fore.CYAN + client.report())
     return summaries
 
 
@@ -246,6 +246,7 @@ import git
 import argparse
 import os
 import sqlite3
+import sys
 import ollama
 import mimetypes
 import colorama
@@ -254,6 +255,9 @@ import os
 from datetime import datetime
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ollama_client import OllamaClient
+
 colorama.init(autoreset=True)
 
 
@@ -380,6 +384,14 @@ def get_diff(repo, commits, index1, index2, yaml_only=False, use_schema=False, s
 
 
 def summarize_diff_ollama(diff_groups, readme_content, language, model="mistral", schema_files=None):
+    client = OllamaClient(model)
+    # The README is the same for every file, so it leads the prompt and the server reuses its evaluated prefix
+    static_context = f"""
+You are a precise assistant that summarizes YAML configuration changes.
+
+Repository README:
+{readme_content}
+"""
     summaries = {}
     for file_type, files in diff_groups.items():
         file_summaries = {}
@@ -387,9 +399,6 @@ def summarize_diff_ollama(diff_groups, readme_content, language, model="mistral"
             diff_text = sanitize_text("\n".join(changes[:1000]))
             schema_context = "\n\nSchema Context:\n" + "\n\n".join(schema_files.values()) if schema_files else ""
             prompt = f"""
-Repository README:
-{readme_content}
-
 This is a YAML configuration file: {file_path}
 
 Below is the git diff of recent changes:
@@ -398,12 +407,10 @@ Below is the git diff of recent changes:
 
 Please summarize the YAML changes in {language}. Explain what keys, sections, or values were added, removed, or modified. If possible, highlight any impact these changes may have on behavior or configurations. Please provide the output in Russian.
 """
-            response = ollama.chat(model=model, messages=[
-                {"role": "system", "content": "You are a precise assistant that summarizes YAML configuration changes."},
-                {"role": "user", "content": prompt}
-            ])
+            response = client.chat(client.build_messages(static_context, prompt))
             file_summaries[file_path] = sanitize_text(response["message"]["content"].strip())
         summaries[file_type] = file_summaries
+    print(Fore.CYAN + client.report())
     return summaries
 
 